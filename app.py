@@ -1,21 +1,37 @@
-from flask import Flask, render_template, jsonify, Response, request, redirect, url_for, flash, send_from_directory, abort
-from flask_socketio import SocketIO
+from flask import Flask, render_template, jsonify, Response, request, redirect, url_for, flash, send_from_directory, abort, stream_with_context, stream_template
+from flask_socketio import SocketIO, emit
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
-from flask_sqlalchemy import SQLAlchemy
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.security import safe_join
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from datetime import datetime
-import time
+import time as time_module
 import os
-import cv2
-import numpy as np
+import hashlib
 import atexit
 import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 
 os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "rtsp_transport;tcp"
 
+# orjson (fast JSON — preferred) ─ falls back to Flask's stdlib encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    print("⚠️ orjson not available — using stdlib json for API responses")
+
 # Local imports
 from utils.yolo_detector import YOLOProcessor
 from utils.rtsp_processor import RTSPManager
+from utils.violation_writer import ViolationWriter
+from utils.jpeg_codec import log_jpeg_backend
+from utils.clock import hms_now
+from utils.status_cache import StatusCache
 from models import db, User, Violation, RTSPCamera, YardAlert
 from hardware_controller import GateController
 
@@ -23,6 +39,49 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-super-secret-key-change-this-in-production'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///substation.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Behind Nginx, set SPARC_X_ACCEL_PREFIX (e.g. /_protected_violations/) to an
+# `internal` location aliased to static/violations — Flask then only authorises
+# and Nginx streams the image bytes via sendfile
+app.config['VIOLATION_IMAGE_ACCEL_PREFIX'] = os.environ.get('SPARC_X_ACCEL_PREFIX', '')
+
+# Created once at boot so the override path never pays for a mkdir syscall
+VIOLATIONS_DIR = os.path.join(app.root_path, "static", "violations")
+os.makedirs(VIOLATIONS_DIR, exist_ok=True)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Routes every jsonify()/app.json.dumps() call through orjson.
+    NON_STR_KEYS keeps int-keyed dicts (e.g. camera statuses) working like stdlib json.
+    """
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS if ORJSON_AVAILABLE else 0
+
+    def dumps(self, obj, **kwargs):
+        option = self.OPTIONS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def dumpb(self, obj):
+        """Encode straight to bytes — skips the str round trip of dumps()."""
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """jsonify() path — orjson already emits bytes, hand them to the response as-is."""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj), mimetype=self.mimetype)
+
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
+def json_bytes(obj):
+    """Encode `obj` for a hand-built JSON Response (orjson when available)."""
+    if ORJSON_AVAILABLE:
+        return app.json.dumpb(obj)
+    return app.json.dumps(obj).encode()
 
 # Initialize extensions
 db.init_app(app)
@@ -31,32 +90,87 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# SQLite tuning, applied to every pooled connection:
+#   WAL          → readers run alongside the writer
+#   NORMAL sync  → no fsync per commit (still crash-safe in WAL mode)
+#   temp_store   → ORDER BY / GROUP BY scratch space stays in RAM, not on the SD card
+#   mmap_size    → page reads served from a 128 MB memory map instead of read() calls
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA cache_size=-32768",   # 32 MB page cache (negative = KiB) instead of ~2 MB
+)
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+# Violation rows from request handlers are committed in batches off-thread
+violation_writer = ViolationWriter(app)
+violation_writer.start()
+
+# Side effects of supervisor actions (snapshot writes) run here, off the request thread
+background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sparc-bg")
+
 # WebSocket support
 socketio = SocketIO(app, async_mode='threading', cors_allowed_origins='*')
 
 # Hardware controller (unchanged)
 gate_controller = GateController(mode='direct', servo_pin=18, relay_pin=23, led_active_low=True)
-gate_state_lock = threading.Lock()
-relay_state = "CLOSED"
-override = False
 
-import time as time_module
 COOLDOWN_SECONDS   = 3          # seconds gate stays closed after a violation
 ENTRY_GRACE_SECONDS = 3        # seconds gate stays open after auto-open
-gate_closed_at: float = 0.0   # timestamp of last auto-close
-gate_opened_at: float = 0.0   # timestamp of last auto-open
+
+@dataclass
+class GateState:
+    """Gate state shared by the gate loop and the control routes. Hold `lock` to read or write."""
+    relay:     str   = "CLOSED"   # state auto/manual control wants
+    override:  bool  = False
+    closed_at: float = 0.0        # timestamp of last auto-close
+    opened_at: float = 0.0        # timestamp of last auto-open
+    pushed:    str   = "CLOSED"   # state the servo + LED were last driven to (boot = closed)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def cooldown_remaining(self):
+        return max(0.0, COOLDOWN_SECONDS - (time_module.time() - self.closed_at))
+
+gate = GateState()
+
+# Encoded bodies for the polled read-only routes, rebuilt at 5 Hz in the
+# background. Gate changes invalidate it so clients never see a stale relay state.
+status_cache = StatusCache(encode=json_bytes)
+
+# camera_id → (built_at, encoded body) for /cameras/<id>/status. A fresh entry
+# also skips the RTSPCamera existence lookup.
+CAMERA_STATUS_TTL = 0.25
+_camera_status_cache = {}
+
+def invalidate_status_cache():
+    status_cache.invalidate()
+    _camera_status_cache.clear()
 
 # Primary USB camera YOLO processor (unchanged)
-yolo = YOLOProcessor(model_path="models/best.pt", camera_index=0, flask_app=app, socketio=socketio)
+yolo = YOLOProcessor(model_path="models/best.pt", camera_index=0, flask_app=app, socketio=socketio,
+                     violation_writer=violation_writer,
+                     infer_every=int(os.environ.get("SPARC_USB_INFER_EVERY", "1")))
 yolo.start()
 
 # 📡 NEW: RTSP multi-camera manager
-# Streams are loaded from the DB after db.create_all() in __main__
-rtsp_manager = RTSPManager(model_path="models/best.pt", flask_app=app, socketio=socketio)
+# Streams are loaded from the DB after db.create_all() in bootstrap()
+rtsp_manager = RTSPManager(model_path="models/best.pt", flask_app=app, socketio=socketio,
+                           violation_writer=violation_writer)
 def cleanup_on_exit():
     print("\n🛑 Shutting down…")
+    status_cache.stop()
     yolo.stop()
     rtsp_manager.cleanup()          # 📡 NEW: stop all RTSP streams
+    background_executor.shutdown(wait=True)
+    violation_writer.stop()         # commit any queued violation rows
     gate_controller.cleanup()
     print("✅ Cleanup complete")
 
@@ -64,47 +178,60 @@ atexit.register(cleanup_on_exit)
 
 # ─────────────────────────────────────────────────────────────
 # Background gate control loop
-# Runs gate logic continuously so relay state updates via
+# Runs gate logic on every inference result so relay state updates via
 # WebSocket the instant PPE status changes — no HTTP polling needed.
+# /status never recomputes the relay; it only reads what this loop decided.
 # ─────────────────────────────────────────────────────────────
+# Auto mode: only a confirmed-OK PPE status asks for the gate to open
+PPE_TO_RELAY = {"OK": "OPEN"}
+
+def push_relay_state(state):
+    """
+    Drive the servo/LED to `state` unless they are already there.
+    Returns True when hardware was actually moved. Call with gate.lock held.
+    """
+    if state == gate.pushed:
+        return False
+    invalidate_status_cache()
+    gate_controller.set_state(state)
+    gate.pushed = state
+    return True
+
 def gate_control_loop():
-    global relay_state, gate_closed_at, gate_opened_at
+    status_seq = 0
     while True:
+        # Wake as soon as YOLO publishes a new result; the timeout keeps
+        # cooldown / entry-grace expiry ticking when the status is unchanged
+        status_seq = yolo.wait_for_status(status_seq, timeout=0.1)
         try:
-            with gate_state_lock:
-                if not override:
-                    current = yolo.latest_status.copy()
-                    previous_relay_state = relay_state
-
-                    if current.get("ppe_status") == "OK":
-                        elapsed = time_module.time() - gate_closed_at
-                        if elapsed >= COOLDOWN_SECONDS:
-                            if relay_state != "OPEN":
-                                gate_opened_at = time_module.time()  # record auto-open time
-                            relay_state = "OPEN"
-                    else:
+            with gate.lock:
+                if not gate.override:
+                    target = PPE_TO_RELAY.get(yolo.latest_status.get("ppe_status"), "CLOSED")
+                    now    = time_module.time()
+
+                    if target != gate.relay:
+                        if target == "OPEN":
+                            if now - gate.closed_at >= COOLDOWN_SECONDS:
+                                gate.relay     = "OPEN"
+                                gate.opened_at = now   # record auto-open time
                         # Only close if the entry grace period has elapsed since last auto-open
-                        entry_elapsed = time_module.time() - gate_opened_at
-                        if entry_elapsed >= ENTRY_GRACE_SECONDS:
-                            if relay_state != "CLOSED":
-                                gate_closed_at = time_module.time()
-                            relay_state = "CLOSED"
-
-                    if previous_relay_state != relay_state:
-                        gate_controller.set_state(relay_state)
-                        yolo.update_gate_state(relay_state)  # already emits gate_update
-                        elapsed   = time_module.time() - gate_closed_at
-                        remaining = max(0.0, COOLDOWN_SECONDS - elapsed)
+                        elif now - gate.opened_at >= ENTRY_GRACE_SECONDS:
+                            gate.relay     = "CLOSED"
+                            gate.closed_at = now
+
+                    # Also picks up relay changes made by /control/auto
+                    if push_relay_state(gate.relay):
+                        yolo.update_gate_state(gate.relay)  # already emits gate_update
+                        remaining = gate.cooldown_remaining()
                         socketio.emit('override_update', {
                             "override":           False,
-                            "relay":              relay_state,
+                            "relay":              gate.relay,
                             "message":            "",
                             "cooldown_active":    remaining > 0,
                             "cooldown_remaining": round(remaining, 1)
                         })
         except Exception as e:
             print(f"❌ Gate control loop error: {e}")
-        time_module.sleep(0.1)
 
 _gate_thread = threading.Thread(target=gate_control_loop, daemon=True)
 _gate_thread.start()
@@ -112,9 +239,56 @@ _gate_thread.start()
 # ─────────────────────────────────────────────────────────────
 # Auth routes  (UNCHANGED)
 # ─────────────────────────────────────────────────────────────
+# user_id → (expires_at, User). Saves a SQLite round trip on every
+# authenticated request; role/profile changes apply within USER_CACHE_TTL.
+USER_CACHE_TTL     = 60    # seconds
+USER_CACHE_MAXSIZE = 256
+_user_cache = {}
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    uid    = int(user_id)
+    now    = time_module.monotonic()
+    cached = _user_cache.get(uid)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    user = db.session.get(User, uid)   # identity-map lookup, not the legacy Query.get
+    if user is not None:
+        # Detach so a commit in some later request can't expire the cached copy
+        db.session.expunge(user)
+        if len(_user_cache) >= USER_CACHE_MAXSIZE:
+            _user_cache.clear()
+        _user_cache[uid] = (now + USER_CACHE_TTL, user)
+    return user
+
+# (username, keyed password digest) → (expires_at, user_id or None).
+# An identical retry within AUTH_RESULT_TTL reuses the outcome instead of paying
+# for another bcrypt round. The per-process key means the stored digests are
+# useless outside this process; entries never outlive the TTL.
+AUTH_RESULT_TTL     = 5     # seconds
+AUTH_RESULT_MAXSIZE = 16
+_AUTH_DIGEST_KEY    = os.urandom(16)
+_recent_auth = {}
+
+def authenticate(username, password):
+    """Return the User for valid credentials, else None."""
+    digest = hashlib.blake2b((password or '').encode(), key=_AUTH_DIGEST_KEY, digest_size=16).digest()
+    key    = (username, digest)
+    now    = time_module.monotonic()
+
+    cached = _recent_auth.get(key)
+    if cached and cached[0] > now:
+        return db.session.get(User, cached[1]) if cached[1] else None
+
+    user = User.query.filter_by(username=username).first()
+    if not (user and bcrypt.check_password_hash(user.password, password)):
+        user = None
+
+    if len(_recent_auth) >= AUTH_RESULT_MAXSIZE:
+        _recent_auth.clear()
+    _recent_auth[key] = (now + AUTH_RESULT_TTL, user.id if user else None)
+    return user
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -123,8 +297,8 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
-        user = User.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password, password):
+        user = authenticate(username, password)
+        if user:
             login_user(user, remember=True)
             return redirect(url_for('index'))
         flash('Invalid credentials', 'danger')
@@ -133,6 +307,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    _user_cache.pop(current_user.id, None)
     logout_user()
     return redirect(url_for('login'))
 
@@ -141,28 +316,26 @@ def logout():
 # WebSocket: push current state to a client the moment they connect
 # This ensures dots/badges are correct without needing a status change
 # ─────────────────────────────────────────────────────────────
-from flask_socketio import emit
-
 @socketio.on('connect')
 def on_connect():
-    current = yolo.latest_status.copy()
-    elapsed   = time_module.time() - gate_closed_at
-    remaining = max(0.0, COOLDOWN_SECONDS - elapsed)
+    current = yolo.latest_status
+    with gate.lock:
+        relay, override_on, remaining = gate.relay, gate.override, gate.cooldown_remaining()
 
     emit('ppe_update', {
         **current,
-        'relay':        relay_state,
-        'last_updated': datetime.now().strftime('%H:%M:%S')
+        'relay':        relay,
+        'last_updated': hms_now()
     })
     emit('gate_update', {
-        'relay':        relay_state,
-        'last_updated': datetime.now().strftime('%H:%M:%S')
+        'relay':        relay,
+        'last_updated': hms_now()
     })
     emit('override_update', {
-        'override':           override,
-        'relay':              relay_state,
+        'override':           override_on,
+        'relay':              relay,
         'message':            '',
-        'cooldown_active':    remaining > 0 and not override,
+        'cooldown_active':    remaining > 0 and not override_on,
         'cooldown_remaining': round(remaining, 1)
     })
 
@@ -182,26 +355,33 @@ def index():
 @app.route('/status')
 @login_required
 def status():
-    # Gate logic is handled by gate_control_loop (every 100ms).
-    # This route only reads and returns current state.
-    with gate_state_lock:
-        current = yolo.latest_status.copy()
-
-        elapsed   = time_module.time() - gate_closed_at
-        remaining = max(0.0, COOLDOWN_SECONDS - elapsed)
-
-        response_data = current.copy()
-        response_data["relay"]              = relay_state
-        response_data["override"]           = override
-        response_data['last_updated']       = datetime.now().strftime('%H:%M:%S')
-        response_data['cooldown_active']    = remaining > 0 and not override
-        response_data['cooldown_remaining'] = round(remaining, 1)
-    return jsonify(response_data)
+    # Gate logic is handled by gate_control_loop (per inference result).
+    # This route only returns the body status_cache last built.
+    return Response(status_cache.payload("status"), mimetype="application/json")
+
+def build_status():
+    with gate.lock:
+        remaining = gate.cooldown_remaining()
+
+        # One dict build — no copy-then-copy-then-mutate
+        response_data = {
+            **yolo.latest_status,
+            "relay":              gate.relay,
+            "override":           gate.override,
+            "last_updated":       hms_now(),
+            "cooldown_active":    remaining > 0 and not gate.override,
+            "cooldown_remaining": round(remaining, 1),
+        }
+    return response_data
+
+status_cache.register("status",  build_status)
+status_cache.register("events",  lambda: list(yolo.events))
+status_cache.register("cameras", lambda: rtsp_manager.get_all_statuses())
 
 @app.route('/events')
 @login_required
 def events():
-    return jsonify(yolo.events[-10:])
+    return Response(status_cache.payload("events"), mimetype="application/json")
 
 @app.route('/api/stats')
 @login_required
@@ -229,24 +409,67 @@ def api_stats():
         'entries_today':    entries_today
     })
 
+def _persist_override(frame_bytes, record):
+    """
+    Background half of control_relay: save the snapshot, then queue the record.
+    `frame_bytes` is the already-encoded JPEG (or None when no frame was available).
+    """
+    if frame_bytes is not None:
+        try:
+            with open(os.path.join(VIOLATIONS_DIR, record['image_path']), "wb") as f:
+                f.write(frame_bytes)
+        except Exception as e:
+            print(f"❌ Error capturing override photo: {e}")
+            record['image_path'] = None
+    violation_writer.submit(**record)
+
+def _persist_gate_capture(record, reason):
+    """Background half of clear_override: snapshot via the detector, then queue the record."""
+    record['image_path'] = yolo.capture_gate_violation(gate_action=record['gate_action'], reason=reason)
+    violation_writer.submit(**record)
+
+PPE_ITEM_FOR_VIOLATION = {'no-helmet': 'helmet', 'no-gloves': 'gloves', 'no-boots': 'boots'}
+
+# control_relay's reply is constant per resulting relay state apart from three
+# fields, so each variant is encoded once and only the placeholders per click
+OVERRIDE_MESSAGES = {
+    "CLOSED": "Manual override: gate CLOSED by supervisor",
+    "OPEN":   "Manual override: gate OPENED by supervisor",
+}
+_OVERRIDE_TEMPLATES = {
+    state: json_bytes({
+        "relay":          state,
+        "override":       True,
+        "message":        msg,
+        "image_captured": "__IMAGE__",
+        "ppe_status":     "__PPE__",
+        "violations":     "__VIOLATIONS__",
+    })
+    for state, msg in OVERRIDE_MESSAGES.items()
+}
+
 @app.route('/control/relay', methods=['POST'])
 @login_required
 def control_relay():
-    global relay_state, override
-    with gate_state_lock:
-        override = True
+    with gate.lock:
+        gate.override = True
 
-        if relay_state == "OPEN":
-            relay_state = "CLOSED"
-            msg         = "Manual override: gate CLOSED by supervisor"
+        if gate.relay == "OPEN":
+            gate.relay = "CLOSED"
             gate_action = "MANUAL_CLOSE"
         else:
-            relay_state = "OPEN"
-            msg         = "Manual override: gate OPENED by supervisor"
+            gate.relay = "OPEN"
             gate_action = "MANUAL_OPEN"
+        new_state = gate.relay
+        msg       = OVERRIDE_MESSAGES[new_state]
+
+        push_relay_state(new_state)
+        ppe_status = yolo.latest_status
+        invalidate_status_cache()
 
-        gate_controller.set_state(relay_state)
-        ppe_status = yolo.latest_status.copy()
+    # Read each PPE field once from the snapshot
+    ppe_state     = ppe_status.get('ppe_status', 'UNKNOWN')
+    has_violation = ppe_status.get('has_violation', False)
 
     # Only capture violation when gate is OPENED (CLOSED→OPEN).
     # Closing the gate is inherently safe — no violation to log.
@@ -255,36 +478,20 @@ def control_relay():
     if gate_action == "MANUAL_OPEN":
         violation_timestamp = datetime.now()
         timestamp_str = violation_timestamp.strftime("%Y%m%d_%H%M%S")
-        current_frame = yolo.latest_frame
-        if current_frame and isinstance(current_frame, bytes):
-            try:
-                nparr    = np.frombuffer(current_frame, np.uint8)
-                frame_np = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                if frame_np is not None and frame_np.size > 0:
-                    image_filename  = f"override_{timestamp_str}.jpg"
-                    violations_dir  = os.path.join(app.root_path, "static", "violations")
-                    os.makedirs(violations_dir, exist_ok=True)
-                    success = cv2.imwrite(os.path.join(violations_dir, image_filename), frame_np)
-                    if not success:
-                        image_filename = None
-            except Exception as e:
-                print(f"❌ Error capturing override photo: {e}")
-                image_filename = None
-
-        violations_detected = []
-        if ppe_status.get('no_helmet'): violations_detected.append('no-helmet')
-        if ppe_status.get('no_gloves'): violations_detected.append('no-gloves')
-        if ppe_status.get('no_boots'):  violations_detected.append('no-boots')
+        current_frame = yolo.snapshot_jpeg()
+        if current_frame:   # None or JPEG bytes — see YOLOProcessor
+            image_filename = f"override_{timestamp_str}.jpg"
+
+        no_h, no_g, no_b = ppe_status.get('no_helmet'), ppe_status.get('no_gloves'), ppe_status.get('no_boots')
+        violations_detected = [name for name, flag in
+                               (('no-helmet', no_h), ('no-gloves', no_g), ('no-boots', no_b)) if flag]
 
         missing_items = (
-            [v.replace('no-', '') for v in violations_detected]
+            [PPE_ITEM_FOR_VIOLATION[v] for v in violations_detected]
             if violations_detected
             else [x for x in ('helmet', 'gloves', 'boots') if not ppe_status.get(x)]
         )
 
-        has_violation = ppe_status.get('has_violation', False)
-        ppe_state     = ppe_status.get('ppe_status', 'UNKNOWN')
-
         if has_violation:
             ppe_description = f"VIOLATION DETECTED: {', '.join(violations_detected)}"
         elif ppe_state == "OK":
@@ -292,79 +499,82 @@ def control_relay():
         else:
             ppe_description = "NO PERSON DETECTED"
 
-        violation = Violation(
-            timestamp      = violation_timestamp,
-            violation_type = 'manual_override',
-            missing_items  = ', '.join(missing_items) if missing_items else 'N/A',
-            image_path     = image_filename,
-            gate_action    = gate_action,
-            operator_id    = current_user.id,
-            notes          = f'{msg} by {current_user.username}. PPE Status: {ppe_description}',
+        # Photo write + DB insert happen on the background executor so the
+        # supervisor's click returns without waiting on SD-card I/O
+        background_executor.submit(
+            _persist_override, current_frame if image_filename else None, dict(
+                timestamp      = violation_timestamp,
+                violation_type = 'manual_override',
+                missing_items  = ', '.join(missing_items) if missing_items else 'N/A',
+                image_path     = image_filename,
+                gate_action    = gate_action,
+                operator_id    = current_user.id,
+                notes          = f'{msg} by {current_user.username}. PPE Status: {ppe_description}',
+            )
         )
-        db.session.add(violation)
-        db.session.commit()
 
     # 🔌 WebSocket: push manual override state
     socketio.emit('override_update', {
         "override": True,
-        "relay": relay_state,
+        "relay": new_state,
         "message": msg
     })
 
-    return jsonify({
-        "relay":          relay_state,
-        "override":       override,
-        "message":        msg,
-        "image_captured": image_filename is not None,
-        "ppe_status":     ppe_status.get('ppe_status', 'UNKNOWN'),
-        "violations":     violations_detected if gate_action == "MANUAL_OPEN" and ppe_status.get('has_violation', False) else [],
-    })
+    violations = violations_detected if gate_action == "MANUAL_OPEN" and has_violation else []
+    body = (_OVERRIDE_TEMPLATES[new_state]
+            .replace(b'"__IMAGE__"', b'true' if image_filename is not None else b'false')
+            .replace(b'"__VIOLATIONS__"', json_bytes(violations))
+            .replace(b'"__PPE__"', json_bytes(ppe_state)))
+    return Response(body, mimetype="application/json")
 
 @app.route("/control/auto", methods=["POST"])
 @login_required
 def clear_override():
-    global override, relay_state, gate_closed_at
-    with gate_state_lock:
-        override   = False
-        ppe_status = yolo.latest_status.copy()
+    with gate.lock:
+        gate.override = False
+        ppe_status    = yolo.latest_status
+        ppe_ok        = ppe_status.get('ppe_status') == 'OK'
 
         # Immediately recalculate gate state based on current PPE
-        if ppe_status.get('ppe_status') == 'OK':
-            elapsed = time_module.time() - gate_closed_at
+        if ppe_ok:
+            elapsed = time_module.time() - gate.closed_at
             if elapsed >= COOLDOWN_SECONDS:
-                relay_state = 'OPEN'
+                gate.relay = 'OPEN'
             else:
-                relay_state = 'CLOSED'
+                gate.relay = 'CLOSED'
         else:
             # PPE violation active — close gate immediately
-            if relay_state != 'CLOSED':
-                gate_closed_at = time_module.time()
-            relay_state = 'CLOSED'
-            gate_controller.set_state('CLOSED')
+            if gate.relay != 'CLOSED':
+                gate.closed_at = time_module.time()
+            gate.relay = 'CLOSED'
+            push_relay_state('CLOSED')
+        # An OPEN decided above is driven by gate_control_loop on its next pass
+        invalidate_status_cache()
+        relay, remaining = gate.relay, gate.cooldown_remaining()
 
     has_violation = ppe_status.get('has_violation', False)
-    violations    = [x for x in ('helmet', 'gloves', 'boots')
-                     if ppe_status.get(f'no_{x}')]
-    image_filename    = None
+    no_h, no_g, no_b = ppe_status.get('no_helmet'), ppe_status.get('no_gloves'), ppe_status.get('no_boots')
+    violations    = [name for name, flag in
+                     (('helmet', no_h), ('gloves', no_g), ('boots', no_b)) if flag]
     violation_timestamp = datetime.now()
 
     if has_violation and violations:
-        image_filename = yolo.capture_gate_violation(
-            gate_action='AUTO_MODE',
-            reason=f'Auto control restored by {current_user.username} - Active violations: {", ".join(violations)}'
-        )
-        violation = Violation(
-            timestamp      = violation_timestamp,
-            violation_type = 'auto_mode_restored',
-            missing_items  = ', '.join(violations),
-            image_path     = image_filename,
-            gate_action    = 'AUTO_MODE',
-            operator_id    = current_user.id,
-            notes          = f'Auto control restored by {current_user.username} - Person detected without: {", ".join(violations)}',
+        # Snapshot write happens on the background executor, like control_relay
+        background_executor.submit(
+            _persist_gate_capture, dict(
+                timestamp      = violation_timestamp,
+                violation_type = 'auto_mode_restored',
+                missing_items  = ', '.join(violations),
+                image_path     = None,
+                gate_action    = 'AUTO_MODE',
+                operator_id    = current_user.id,
+                notes          = f'Auto control restored by {current_user.username} - Person detected without: {", ".join(violations)}',
+            ),
+            f'Auto control restored by {current_user.username} - Active violations: {", ".join(violations)}',
         )
     else:
-        ppe_state = "complete PPE" if ppe_status.get('ppe_status') == 'OK' else "no person detected"
-        violation = Violation(
+        ppe_state = "complete PPE" if ppe_ok else "no person detected"
+        violation_writer.submit(
             timestamp      = violation_timestamp,
             violation_type = 'auto_mode_restored',
             missing_items  = 'N/A',
@@ -373,24 +583,19 @@ def clear_override():
             operator_id    = current_user.id,
             notes          = f'Auto control restored by {current_user.username} - {ppe_state}',
         )
-    db.session.add(violation)
-    db.session.commit()
 
     # 🔌 WebSocket: push override state change + force status refresh
-    elapsed   = time_module.time() - gate_closed_at
-    remaining = max(0.0, COOLDOWN_SECONDS - elapsed)
-
     socketio.emit('override_update', {
         "override":          False,
-        "relay":             relay_state,
+        "relay":             relay,
         "message":           "Automatic PPE control restored",
         "cooldown_active":   remaining > 0,
         "cooldown_remaining": round(remaining, 1)
     })
     socketio.emit('ppe_update', {
         **yolo.latest_status,
-        "relay": relay_state,
-        "last_updated": datetime.now().strftime('%H:%M:%S')
+        "relay": relay,
+        "last_updated": hms_now()
     })
 
     return jsonify({
@@ -404,40 +609,177 @@ def clear_override():
 # ─────────────────────────────────────────────────────────────
 # Violations review  (UNCHANGED)
 # ─────────────────────────────────────────────────────────────
+VIOLATIONS_PER_PAGE = 12
+
+class KeysetPage:
+    """
+    One page of violations fetched by keyset (cursor) instead of OFFSET.
+    Exposes the same attributes violations.html used from Flask-SQLAlchemy's
+    Pagination, plus `prev_cursor` / `next_cursor` for the nav links.
+
+    A cursor is "<iso timestamp>,<id>" of a boundary row; (timestamp, id)
+    is walked through ix_violation_timestamp, whose entries end in the rowid.
+    """
+
+    # COUNT(*) is a full index scan; the "Page X of Y" label tolerates a total
+    # that is up to COUNT_TTL seconds old
+    COUNT_TTL    = 30
+    _count_cache = (0.0, 0)   # (expires_at, total)
+
+    @classmethod
+    def approximate_total(cls):
+        expires_at, total = cls._count_cache
+        now = time_module.monotonic()
+        if now >= expires_at:
+            total = Violation.query.count()
+            cls._count_cache = (now + cls.COUNT_TTL, total)
+        return total
+
+    def __init__(self, page, before=None, after=None, per_page=VIOLATIONS_PER_PAGE):
+        self.page     = max(1, page)
+        self.per_page = per_page
+        self.total    = self.approximate_total()
+        self.pages    = max(1, -(-self.total // per_page))
+
+        newest_first = (Violation.timestamp.desc(), Violation.id.desc())
+        query = Violation.query
+
+        if after:
+            # Going back: take the rows just newer than the cursor, then flip them
+            ts, vid = after
+            rows = (query.filter(db.or_(Violation.timestamp > ts,
+                                        db.and_(Violation.timestamp == ts, Violation.id > vid)))
+                         .order_by(Violation.timestamp.asc(), Violation.id.asc())
+                         .limit(per_page).all())
+            rows.reverse()
+        elif before:
+            ts, vid = before
+            rows = (query.filter(db.or_(Violation.timestamp < ts,
+                                        db.and_(Violation.timestamp == ts, Violation.id < vid)))
+                         .order_by(*newest_first)
+                         .limit(per_page + 1).all())
+        else:
+            # No cursor: first page, or an old ?page=N link (OFFSET fallback)
+            rows = (query.order_by(*newest_first)
+                         .offset((self.page - 1) * per_page)
+                         .limit(per_page + 1).all())
+
+        self.items    = rows[:per_page]
+        self.has_prev = self.page > 1
+        self.has_next = len(rows) > per_page or (bool(after) and self.page < self.pages)
+        self.prev_num = self.page - 1
+        self.next_num = self.page + 1
+        self.prev_cursor = self._cursor(self.items[0])  if self.items else None
+        self.next_cursor = self._cursor(self.items[-1]) if self.items else None
+
+    @staticmethod
+    def _cursor(violation):
+        return f"{violation.timestamp.isoformat()},{violation.id}"
+
+    @staticmethod
+    def parse_cursor(value):
+        """Return (timestamp, id) for a cursor string, or None if absent/malformed."""
+        if not value:
+            return None
+        try:
+            ts, vid = value.rsplit(',', 1)
+            return datetime.fromisoformat(ts), int(vid)
+        except ValueError:
+            return None
+
+
 @app.route('/violations')
 @login_required
 def violations():
     page       = request.args.get('page', 1, type=int)
-    violations = Violation.query.order_by(Violation.timestamp.desc()).paginate(
-        page=page, per_page=12, error_out=False
-    )
-    return render_template('violations.html', violations=violations)
+    before     = KeysetPage.parse_cursor(request.args.get('before'))
+    after      = KeysetPage.parse_cursor(request.args.get('after'))
+    violations = KeysetPage(page, before=before, after=after)
+    # Streamed: the header and first cards reach the browser (and it starts
+    # fetching thumbnails) while the remaining rows are still rendering
+    return stream_template('violations.html', violations=violations)
 
 @app.route('/violations/<int:id>/notes', methods=['POST'])
 @login_required
 def add_violation_notes(id):
     violation = Violation.query.get_or_404(id)
-    violation.supervisor_notes = request.json.get('notes')
+    notes     = request.json.get('notes')
+    # Save-without-edit (or auto-save on blur) shouldn't cost a write transaction
+    if (violation.supervisor_notes or "") == (notes or ""):
+        return jsonify({'status': 'unchanged', 'violation_id': id, 'notes': violation.supervisor_notes})
+    violation.supervisor_notes = notes
     db.session.commit()
     return jsonify({'status': 'success', 'violation_id': id, 'notes': violation.supervisor_notes})
 
+VIOLATION_IMAGE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
 @app.route('/violation-image/<path:filename>')
 @login_required
 def serve_violation_image(filename):
-    return send_from_directory('static/violations', filename)
+    accel_prefix = app.config['VIOLATION_IMAGE_ACCEL_PREFIX']
+    if accel_prefix:
+        accel_path = safe_join(accel_prefix, filename)
+        if accel_path is None:   # path traversal attempt
+            abort(404)
+        response = Response(headers={
+            "X-Accel-Redirect": accel_path,
+            "Content-Type":     "image/jpeg",
+        })
+    else:
+        # conditional=True (default) answers If-None-Match / If-Modified-Since with 304
+        response = send_from_directory(VIOLATIONS_DIR, filename)
+
+    # Snapshots are timestamp-named and never rewritten — let the browser keep them.
+    # "private": they sit behind login, so shared proxies must not store them.
+    response.headers["Cache-Control"] = VIOLATION_IMAGE_CACHE_CONTROL
+    return response
+
+# multipart/x-mixed-replace framing, shared by every MJPEG stream route.
+# Content-Length lets the client read each part in one go instead of
+# scanning the bytes for the next boundary.
+MJPEG_PART_HEADER = b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+MJPEG_PART_SUFFIX = b"\r\n"
+
+# Each open MJPEG stream pins a server thread for as long as the tab stays open.
+# Cap concurrent viewers (USB + CCTV feeds combined) so forgotten tabs can't
+# starve /status polls and supervisor actions of threads.
+MAX_STREAM_VIEWERS = 8
+_stream_viewers = threading.BoundedSemaphore(MAX_STREAM_VIEWERS)
+
+def mjpeg_response(generator):
+    """
+    Wrap an MJPEG generator whose caller already holds a viewer slot.
+    The slot is released when the server closes the response — including when
+    the client disconnects before the first frame was sent.
+    """
+    # direct_passthrough: Werkzeug writes the yielded chunks as-is, unwrapped
+    response = Response(stream_with_context(generator),
+                        mimetype="multipart/x-mixed-replace; boundary=frame",
+                        direct_passthrough=True)
+    response.call_on_close(_stream_viewers.release)
+    return response
 
 @app.route("/video_feed")
 def video_feed():
     """Primary USB camera feed (unchanged)."""
+    if not _stream_viewers.acquire(blocking=False):
+        abort(503)   # too many open streams
+    yolo.add_viewer()   # the detector only draws + encodes frames while someone watches
+
     def generate():
+        last_seq = -1
         while True:
-            frame = yolo.latest_frame
+            # Blocks until the detector publishes a new JPEG — no duplicate frames
+            frame, last_seq = yolo.wait_for_frame(last_seq, timeout=1.0)
             if frame is None:
-                time.sleep(0.05)
                 continue
-            yield (b"--frame\r\n"
-                   b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n")
-    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame")
+            # Separate chunks — avoids copying the whole JPEG into a new bytes object
+            yield MJPEG_PART_HEADER % len(frame)
+            yield frame
+            yield MJPEG_PART_SUFFIX
+    response = mjpeg_response(generate())
+    response.call_on_close(yolo.remove_viewer)
+    return response
 
 
 # ─────────────────────────────────────────────────────────────
@@ -479,22 +821,34 @@ def add_camera():
     if not url.startswith(('rtsp://', 'rtmp://', 'http://', 'https://')):
         return jsonify({'status': 'error', 'message': 'URL must start with rtsp://, rtmp://, http://, or https://'}), 400
 
+    # Unique-index lookup. Older DBs predate the constraint, so check explicitly
+    if db.session.query(RTSPCamera.id).filter_by(url=url).first():
+        return jsonify({'status': 'error', 'message': 'A camera with this URL already exists'}), 409
+
     cam = RTSPCamera(name=name, url=url, location=location, enabled=True)
     db.session.add(cam)
     db.session.commit()
 
     # Start the live stream immediately
     rtsp_manager.add_stream(cam.id, cam.name, cam.url)
+    invalidate_status_cache()
 
     return jsonify({'status': 'success', 'camera': cam.to_dict()}), 201
 
 
+def _require_camera(camera_id):
+    """404 unless the camera exists — in-memory ID set, no query per request."""
+    if not rtsp_manager.has_camera(camera_id):
+        abort(404)
+
+
 @app.route('/cameras/<int:camera_id>', methods=['DELETE'])
 @login_required
 def delete_camera(camera_id):
     """Stop the stream and delete the DB record."""
     cam = RTSPCamera.query.get_or_404(camera_id)
     rtsp_manager.remove_stream(camera_id)
+    invalidate_status_cache()
     db.session.delete(cam)
     db.session.commit()
     return jsonify({'status': 'success', 'message': f'Camera "{cam.name}" removed'})
@@ -524,6 +878,7 @@ def toggle_camera(camera_id):
     else:
         rtsp_manager.disable_stream(cam.id)
         msg = f'Camera "{cam.name}" disabled'
+    invalidate_status_cache()
 
     return jsonify({'status': 'success', 'message': msg, 'camera': cam.to_dict()})
 
@@ -532,54 +887,64 @@ def toggle_camera(camera_id):
 @login_required
 def camera_status(camera_id):
     """Return live PPE detection status for one RTSP camera."""
-    RTSPCamera.query.get_or_404(camera_id)   # 404 if unknown ID
+    now    = time_module.monotonic()
+    cached = _camera_status_cache.get(camera_id)
+    if cached and now - cached[0] < CAMERA_STATUS_TTL:
+        return Response(cached[1], mimetype="application/json")
+
+    _require_camera(camera_id)
     status = rtsp_manager.get_status(camera_id)
-    status['last_updated'] = datetime.now().strftime('%H:%M:%S')
-    return jsonify(status)
+    status['last_updated'] = hms_now()
+    body = json_bytes(status)
+    _camera_status_cache[camera_id] = (now, body)
+    return Response(body, mimetype="application/json")
 
 
 @app.route('/cameras/status/all')
 @login_required
 def all_cameras_status():
     """Return PPE status for every active RTSP stream in one call."""
-    return jsonify(rtsp_manager.get_all_statuses())
+    return Response(status_cache.payload("cameras"), mimetype="application/json")
 
 
 @app.route('/cameras/<int:camera_id>/feed')
 @login_required
 def rtsp_video_feed(camera_id):
-    RTSPCamera.query.get_or_404(camera_id)
-
-    # Wait up to 10s for first frame — if none, return 503 so img onerror fires
-    deadline = time.time() + 10
-    while time.time() < deadline:
-        if rtsp_manager.get_frame(camera_id) is not None:
-            break
-        time.sleep(0.1)
-    else:
+    _require_camera(camera_id)
+
+    # Wait up to 10s for first frame — if none, return 503 so img onerror fires.
+    # Seq 0 means "nothing published yet", so this returns as soon as one exists.
+    first_frame, _ = rtsp_manager.wait_for_frame(camera_id, 0, timeout=10.0)
+    if first_frame is None:
         abort(503)
 
+    if not _stream_viewers.acquire(blocking=False):
+        abort(503)   # too many open streams
+
     def generate():
+        last_seq = -1
         consecutive_failures = 0
         while True:
-            frame = rtsp_manager.get_frame(camera_id)
+            # Blocks until the stream publishes a new JPEG — no duplicate frames
+            frame, last_seq = rtsp_manager.wait_for_frame(camera_id, last_seq, timeout=1.0)
             if frame is None:
                 consecutive_failures += 1
-                if consecutive_failures > 100:  # ~10 seconds of no frames
+                if consecutive_failures > 10:  # ~10 seconds of no frames
                     return
-                time.sleep(0.1)
                 continue
             consecutive_failures = 0
-            yield (b"--frame\r\n"
-                   b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n")
+            # Separate chunks — avoids copying the whole JPEG into a new bytes object
+            yield MJPEG_PART_HEADER % len(frame)
+            yield frame
+            yield MJPEG_PART_SUFFIX
 
-    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    return mjpeg_response(generate())
 
 @app.route('/cameras/<int:camera_id>/capture', methods=['POST'])
 @login_required
 def capture_cctv_violation(camera_id):
     """Supervisor manually captures a violation snapshot from a CCTV stream."""
-    RTSPCamera.query.get_or_404(camera_id)
+    _require_camera(camera_id)
     data  = request.get_json() or {}
     notes = (data.get('notes') or '').strip()
 
@@ -615,15 +980,22 @@ def acknowledge_yard_alert(alert_id):
     })
 
 # ─────────────────────────────────────────────────────────────
-# Entry point
+# Startup — shared by `python app.py` and gunicorn (see gunicorn.conf.py)
 # ─────────────────────────────────────────────────────────────
-if __name__ == "__main__":
+def bootstrap():
+    """Create/upgrade the DB schema, start saved RTSP streams and print the banner."""
     with app.app_context():
         db.create_all()   # creates RTSPCamera table on first run too
+        # create_all() leaves existing tables alone — add any newer indexes explicitly
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
 
     # 📡 Load saved cameras from DB and start their streams
     rtsp_manager.load_from_db()
+    status_cache.start()
 
+    log_jpeg_backend()
     print("\n" + "="*50)
     print("🚀 SUBSTATION PPE MONITORING SYSTEM")
     print("="*50)
@@ -634,4 +1006,10 @@ if __name__ == "__main__":
     print(f"🚪 Gate:      {gate_controller.get_state()}")
     print("="*50 + "\n")
 
-    socketio.run(app, host="0.0.0.0", port=5000, debug=False, use_reloader=False)
\ No newline at end of file
+
+# ─────────────────────────────────────────────────────────────
+# Entry point
+# ─────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    bootstrap()
+    socketio.run(app, host="0.0.0.0", port=5000, debug=False, use_reloader=False)
@@ -1,6 +1,21 @@
 import cv2
+import os
+import platform
 
-cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+# Same opt-in as the detector: SPARC_USB_GSTREAMER=1 opens the camera through a
+# GStreamer pipeline whose appsink keeps only the newest frame (no stale queue)
+GST_PIPELINE = (
+    "v4l2src device=/dev/video0 ! "
+    "video/x-raw,format=YUY2,width=640,height=480 ! videoconvert ! video/x-raw,format=BGR ! "
+    "appsink drop=true max-buffers=1 sync=false"
+)
+
+if platform.system() == 'Windows':
+    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+elif os.environ.get("SPARC_USB_GSTREAMER") == "1":
+    cap = cv2.VideoCapture(GST_PIPELINE, cv2.CAP_GSTREAMER)
+else:
+    cap = cv2.VideoCapture(0, cv2.CAP_V4L2)
 print("Opened:", cap.isOpened())
 
 while True:
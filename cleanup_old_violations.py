@@ -5,8 +5,57 @@ Run periodically to manage storage space
 from app import app, db
 from models import Violation
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, delete
 import os
 
+# Rows per DELETE/commit — same knob as delete_violations.py, so a long-overdue
+# purge never holds SQLite's write lock (and stalls the ViolationWriter) for long
+BATCH_SIZE = int(os.environ.get("SPARC_DELETE_BATCH_SIZE", "1000"))
+
+def _remove_image(path):
+    """Delete one violation image; True if a file was removed."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True   # silent — a print per file dominates big runs; the summary counts
+
+def _purge(is_old, violations_dir):
+    """
+    Delete rows matching `is_old` in BATCH_SIZE chunks, one commit each. A
+    chunk's images are unlinked on a thread pool only after its commit, so an
+    interrupted purge never leaves rows pointing at removed files.
+    Returns (records deleted, images deleted).
+    """
+    returning = db.engine.dialect.delete_returning
+    oldest    = select(Violation.id).where(is_old).limit(BATCH_SIZE)
+    records   = 0
+    unlinks   = []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        while True:
+            if returning:
+                # DELETE … RETURNING (SQLite 3.35+): the delete hands back the paths to unlink
+                image_paths = db.session.execute(
+                    delete(Violation).where(Violation.id.in_(oldest))
+                    .returning(Violation.image_path)
+                ).scalars().all()
+            else:
+                rows = db.session.execute(select(Violation.id, Violation.image_path)
+                                          .where(is_old).limit(BATCH_SIZE)).all()
+                if rows:
+                    db.session.execute(delete(Violation).where(Violation.id.in_([r.id for r in rows])))
+                image_paths = [r.image_path for r in rows]
+            db.session.commit()
+            if not image_paths:
+                break
+
+            records += len(image_paths)
+            # Unlinks are independent — overlap the SD card round trips (and the next chunk)
+            unlinks += [pool.submit(_remove_image, os.path.join(violations_dir, p))
+                        for p in image_paths if p]
+        return records, sum(f.result() for f in unlinks)
+
 def cleanup_old_violations(days_to_keep=30, dry_run=True):
     """
     Delete violations older than specified days
@@ -16,45 +65,35 @@ def cleanup_old_violations(days_to_keep=30, dry_run=True):
         dry_run: If True, only show what would be deleted (default: True)
     """
     cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+    is_old      = Violation.timestamp < cutoff_date
     
     with app.app_context():
-        # Find old violations
-        old_violations = Violation.query.filter(
-            Violation.timestamp < cutoff_date
-        ).all()
-        
-        if not old_violations:
-            print(f"✅ No violations older than {days_to_keep} days found")
-            return
-        
-        print(f"{'[DRY RUN] ' if dry_run else ''}Found {len(old_violations)} violations older than {days_to_keep} days")
-        
-        deleted_images = 0
-        deleted_records = 0
-        
-        for violation in old_violations:
-            # Delete image file if exists
-            if violation.image_path:
-                image_path = os.path.join(
-                    app.root_path, 
-                    'static', 
-                    'violations', 
-                    violation.image_path
-                )
-                
-                if os.path.exists(image_path):
-                    if not dry_run:
-                        os.remove(image_path)
-                    print(f"  {'[WOULD DELETE]' if dry_run else '[DELETED]'} {violation.image_path}")
-                    deleted_images += 1
-            
-            # Delete database record
-            if not dry_run:
-                db.session.delete(violation)
-            deleted_records += 1
-        
+        violations_dir = os.path.join(app.root_path, 'static', 'violations')
+
         if not dry_run:
-            db.session.commit()
+            deleted_records, deleted_images = _purge(is_old, violations_dir)
+            if not deleted_records:
+                print(f"✅ No violations older than {days_to_keep} days found")
+                return
+        else:
+            # Only the image paths are needed — no ORM objects for every old row
+            image_paths = db.session.execute(
+                select(Violation.image_path).where(is_old)
+            ).scalars().all()
+
+            if not image_paths:
+                print(f"✅ No violations older than {days_to_keep} days found")
+                return
+
+            print(f"[DRY RUN] Found {len(image_paths)} violations older than {days_to_keep} days")
+
+            deleted_records = len(image_paths)
+            deleted_images  = 0
+            for p in image_paths:
+                path = os.path.join(violations_dir, p) if p else None
+                if path and os.path.exists(path):
+                    print(f"  [WOULD DELETE] {os.path.basename(path)}")
+                    deleted_images += 1
         
         print(f"\n{'[DRY RUN] Would delete:' if dry_run else 'Deleted:'}")
         print(f"  📷 Images: {deleted_images}")
@@ -76,11 +115,12 @@ def get_storage_stats():
     total_size = 0
     file_count = 0
     
-    for filename in os.listdir(violations_dir):
-        file_path = os.path.join(violations_dir, filename)
-        if os.path.isfile(file_path):
-            total_size += os.path.getsize(file_path)
-            file_count += 1
+    # scandir hands back the file type with each entry — one stat per file
+    with os.scandir(violations_dir) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                total_size += entry.stat(follow_symlinks=False).st_size
+                file_count += 1
     
     # Convert to MB
     size_mb = total_size / (1024 * 1024)
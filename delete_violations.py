@@ -3,15 +3,60 @@ Delete specific violations by ID, last N violations, or by criteria
 """
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import delete
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import app, db
 from models import Violation
 
+# Only the columns the listing and image cleanup need — no ORM objects
+PREVIEW_COLUMNS = (Violation.id, Violation.timestamp, Violation.violation_type, Violation.image_path)
+
+# Rows per DELETE/commit — keeps each transaction (and the WAL) small
+BATCH_SIZE = int(os.environ.get("SPARC_DELETE_BATCH_SIZE", "1000"))
+
+
+def _delete_rows(ids):
+    """DELETE … WHERE id IN (…) and commit — no rows loaded into the session."""
+    db.session.execute(
+        delete(Violation).where(Violation.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _remove_image(path):
+    """Delete one violation image; True if a file was removed."""
+    try:
+        os.unlink(path)   # no exists() precheck — one syscall, no race
+    except FileNotFoundError:
+        return False
+    return True   # silent — the preview already listed every path
+
+
+def _delete_violations(violations):
+    """
+    Delete the rows in BATCH_SIZE chunks, one commit each. A chunk's images are
+    unlinked on a thread pool only once its commit succeeded (overlapping the
+    next chunk's DELETE), so a failed or interrupted delete never leaves rows
+    pointing at removed files. Returns the number of images removed.
+    """
+    violations_dir = os.path.join(app.root_path, 'static', 'violations')
+    unlinks = []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for start in range(0, len(violations), BATCH_SIZE):
+            batch = violations[start:start + BATCH_SIZE]
+            _delete_rows([v.id for v in batch])
+            unlinks += [pool.submit(_remove_image, os.path.join(violations_dir, v.image_path))
+                        for v in batch if v.image_path]
+        return sum(f.result() for f in unlinks)
+
+
 def delete_by_ids(violation_ids, confirm=True):
     """Delete violations by specific IDs"""
     with app.app_context():
-        violations = Violation.query.filter(Violation.id.in_(violation_ids)).all()
+        violations = db.session.query(*PREVIEW_COLUMNS).filter(Violation.id.in_(violation_ids)).all()
         
         if not violations:
             print(f"❌ No violations found with IDs: {violation_ids}")
@@ -27,26 +72,14 @@ def delete_by_ids(violation_ids, confirm=True):
                 print("❌ Cancelled")
                 return
         
-        # Delete images
-        deleted_images = 0
-        for v in violations:
-            if v.image_path:
-                image_path = os.path.join(app.root_path, 'static', 'violations', v.image_path)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    deleted_images += 1
-                    print(f"  🗑️  Deleted image: {v.image_path}")
-            
-            db.session.delete(v)
-        
-        db.session.commit()
+        deleted_images = _delete_violations(violations)
         print(f"\n✅ Deleted {len(violations)} violation(s) and {deleted_images} image(s)")
 
 
 def delete_last_n(n, confirm=True):
     """Delete the last N violations (most recent)"""
     with app.app_context():
-        violations = Violation.query.order_by(Violation.timestamp.desc()).limit(n).all()
+        violations = db.session.query(*PREVIEW_COLUMNS).order_by(Violation.timestamp.desc()).limit(n).all()
         
         if not violations:
             print(f"❌ No violations found")
@@ -62,26 +95,14 @@ def delete_last_n(n, confirm=True):
                 print("❌ Cancelled")
                 return
         
-        # Delete images
-        deleted_images = 0
-        for v in violations:
-            if v.image_path:
-                image_path = os.path.join(app.root_path, 'static', 'violations', v.image_path)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    deleted_images += 1
-                    print(f"  🗑️  Deleted image: {v.image_path}")
-            
-            db.session.delete(v)
-        
-        db.session.commit()
+        deleted_images = _delete_violations(violations)
         print(f"\n✅ Deleted {len(violations)} violation(s) and {deleted_images} image(s)")
 
 
 def delete_by_type(violation_type, confirm=True):
     """Delete violations by type (e.g., 'manual_override', 'gate_action')"""
     with app.app_context():
-        violations = Violation.query.filter_by(violation_type=violation_type).all()
+        violations = db.session.query(*PREVIEW_COLUMNS).filter_by(violation_type=violation_type).all()
         
         if not violations:
             print(f"❌ No violations found with type: {violation_type}")
@@ -97,80 +118,88 @@ def delete_by_type(violation_type, confirm=True):
                 print("❌ Cancelled")
                 return
         
-        # Delete images
-        deleted_images = 0
-        for v in violations:
-            if v.image_path:
-                image_path = os.path.join(app.root_path, 'static', 'violations', v.image_path)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    deleted_images += 1
-            
-            db.session.delete(v)
-        
-        db.session.commit()
+        deleted_images = _delete_violations(violations)
         print(f"\n✅ Deleted {len(violations)} violation(s) and {deleted_images} image(s)")
 
 
 def list_all_violations():
     """List all violations with IDs"""
     with app.app_context():
-        violations = Violation.query.order_by(Violation.timestamp.desc()).all()
+        total = Violation.query.count()
         
-        if not violations:
+        if not total:
             print("📋 No violations found")
             return
         
-        print(f"\n📋 All Violations ({len(violations)} total):\n")
+        print(f"\n📋 All Violations ({total} total):\n")
         print(f"{'ID':<5} {'Timestamp':<20} {'Type':<20} {'Gate Action':<15} {'Image'}")
         print("-" * 100)
         
-        for v in violations:
+        # Stream plain rows 500 at a time — memory stays flat however big the table gets
+        rows = (Violation.query
+                .with_entities(Violation.id, Violation.timestamp, Violation.violation_type,
+                               Violation.gate_action, Violation.image_path)
+                .order_by(Violation.timestamp.desc())
+                .yield_per(500))
+        for v in rows:
             print(f"{v.id:<5} {v.timestamp.strftime('%Y-%m-%d %H:%M:%S'):<20} {v.violation_type or 'N/A':<20} {v.gate_action or 'N/A':<15} {v.image_path or 'N/A'}")
 
 
 if __name__ == '__main__':
     print("🗑️  Violation Deletion Utility\n")
     
-    if len(sys.argv) < 2:
+    # -y / --yes skips the confirmation prompt (for scripts and cron jobs)
+    args    = [a for a in sys.argv[1:] if a not in ('-y', '--yes')]
+    confirm = len(args) == len(sys.argv) - 1
+    
+    if len(args) < 1:
         print("Usage:")
         print("  python delete_violations.py list                    # List all violations")
         print("  python delete_violations.py last 2                  # Delete last 2 violations")
         print("  python delete_violations.py ids 5 7 9               # Delete violations with IDs 5, 7, 9")
         print("  python delete_violations.py type manual_override    # Delete all manual overrides")
+        print("  python delete_violations.py ids - < ids.txt         # Read IDs from stdin (whitespace-separated)")
+        print("  Add -y / --yes to skip the confirmation prompt")
         sys.exit(1)
     
-    command = sys.argv[1]
+    command = args[0]
     
     if command == 'list':
         list_all_violations()
     
     elif command == 'last':
-        if len(sys.argv) < 3:
+        if len(args) < 2:
             print("❌ Error: Specify number of violations to delete")
             print("Example: python delete_violations.py last 2")
             sys.exit(1)
         
-        n = int(sys.argv[2])
-        delete_last_n(n)
+        n = int(args[1])
+        delete_last_n(n, confirm=confirm)
     
     elif command == 'ids':
-        if len(sys.argv) < 3:
+        if len(args) < 2:
             print("❌ Error: Specify violation IDs to delete")
             print("Example: python delete_violations.py ids 5 7 9")
             sys.exit(1)
         
-        ids = [int(x) for x in sys.argv[2:]]
-        delete_by_ids(ids)
+        # "-" reads IDs from stdin, so long lists aren't bound by argv limits
+        if args[1:] == ['-']:
+            if confirm:
+                print("❌ Error: IDs from stdin need -y (stdin can't also answer the prompt)")
+                sys.exit(1)
+            ids = [int(x) for x in sys.stdin.read().split()]
+        else:
+            ids = [int(x) for x in args[1:]]
+        delete_by_ids(ids, confirm=confirm)
     
     elif command == 'type':
-        if len(sys.argv) < 3:
+        if len(args) < 2:
             print("❌ Error: Specify violation type")
             print("Example: python delete_violations.py type manual_override")
             sys.exit(1)
         
-        vtype = sys.argv[2]
-        delete_by_type(vtype)
+        vtype = args[1]
+        delete_by_type(vtype, confirm=confirm)
     
     else:
         print(f"❌ Unknown command: {command}")
@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+"""
+Production server config:  gunicorn -c gunicorn.conf.py app:app
+
+• ONE worker — the USB camera, GPIO pins, YOLO models and Socket.IO client
+  state all live in a single process. A second worker would fight over the
+  camera and servo.
+• Many threads (gthread) — each /video_feed viewer holds a thread for the
+  lifetime of the stream, while /status polls and supervisor POSTs
+  keep getting served alongside them.
+"""
+
+bind         = "0.0.0.0:5000"
+workers      = 1
+worker_class = "gthread"
+threads      = 16
+timeout      = 0          # MJPEG streams are infinite responses — never reap them
+keepalive    = 5
+
+
+def post_worker_init(worker):
+    """Run the same startup as `python app.py` (DB schema + RTSP streams)."""
+    from app import bootstrap
+    bootstrap()
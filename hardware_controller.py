@@ -30,6 +30,8 @@ Setup (run once on Pi):
   sudo systemctl start pigpiod
 """
 
+import queue
+import threading
 import time
 
 # ── pigpio (DMA PWM — preferred) ─────────────────────────────────────────────
@@ -123,6 +125,9 @@ class GateController:
     """
     Controls the servo gate using pigpio DMA PWM (CPU-load independent)
     and the relay LED indicator.
+
+    open_gate()/close_gate() return immediately: the ~1 s servo sweep runs on
+    one worker thread, so callers (the gate loop, request handlers) never block.
     """
 
     # SG90 pulse widths in microseconds (pigpio uses µs, not duty %)
@@ -131,6 +136,9 @@ class GateController:
     OPEN_PW   = 2150   # µs → ~135° (gate open)
     PWM_FREQ  = 50     # Hz — SG90 standard
 
+    # RPi.GPIO fallback: duty cycle % for each whole angle 0..180°, built once
+    DUTY_LUT  = tuple(2.5 + (a / 180.0) * 10.0 for a in range(181))
+
     def __init__(self,
                  mode           = 'direct',
                  servo_pin      = 18,
@@ -140,8 +148,10 @@ class GateController:
         self.mode          = mode
         self.servo_pin     = servo_pin
         self.relay_pin     = relay_pin
-        self.current_state = "CLOSED"
+        self.current_state = "CLOSED"   # requested state — what callers see
+        self._physical     = "CLOSED"   # where the servo actually is (worker only)
         self._pi           = None   # pigpio instance
+        self._commands     = queue.Queue()
 
         # LED relay (always uses RPi.GPIO digital out — no PWM needed)
         self.led = LEDIndicator(relay_pin, led_active_low)
@@ -155,6 +165,9 @@ class GateController:
 
         # Ensure LED matches boot state
         self.led.set_closed()
+
+        self._worker = threading.Thread(target=self._servo_worker, daemon=True)
+        self._worker.start()
         print(f"✅ GateController ready — servo GPIO{servo_pin}, "
               f"relay GPIO{relay_pin}, "
               f"PWM={'pigpio DMA' if self._pi else 'RPi.GPIO software'}")
@@ -232,7 +245,7 @@ class GateController:
 
     # ── angle helpers (RPi.GPIO fallback) ────────────────────────────────────
     def _angle_to_duty(self, angle):
-        return 2.5 + (angle / 180.0) * 10.0
+        return self.DUTY_LUT[int(angle)]
 
     def _set_servo_angle(self, target_angle, step=3, step_delay=0.02):
         if not GPIO_AVAILABLE:
@@ -245,8 +258,9 @@ class GateController:
         else:
             angles = range(int(current_angle), int(target_angle) - 1, -step)
 
+        duty_lut = self.DUTY_LUT
         for angle in angles:
-            self.servo_pwm.ChangeDutyCycle(self._angle_to_duty(angle))
+            self.servo_pwm.ChangeDutyCycle(duty_lut[angle])
             time.sleep(step_delay)
 
         self.servo_pwm.ChangeDutyCycle(self._angle_to_duty(target_angle))
@@ -254,38 +268,64 @@ class GateController:
         self.servo_pwm.ChangeDutyCycle(0)  # stop jitter
         self._current_angle = target_angle
 
+    # ── servo worker ─────────────────────────────────────────────────────────
+    def _servo_worker(self):
+        """Run queued moves one at a time; None is the shutdown sentinel."""
+        while True:
+            target = self._commands.get()
+            stop   = target is None
+            # Collapse a backlog (e.g. OPEN, CLOSE, OPEN) to its latest target
+            while not self._commands.empty():
+                queued = self._commands.get_nowait()
+                if queued is None:
+                    stop = True
+                else:
+                    target = queued
+            if target is not None and target != self._physical:
+                try:
+                    self._move(target)
+                except Exception as e:
+                    print(f"❌ Servo move error: {e}")
+            if stop:
+                return
+
+    def _move(self, state):
+        """Blocking servo sweep + LED switch — worker thread only."""
+        if state == "OPEN":
+            if self._pi:
+                self._set_pulsewidth(self.OPEN_PW)
+            elif GPIO_AVAILABLE:
+                self._set_servo_angle(135)
+            self.led.set_open()
+        else:
+            if self._pi:
+                self._set_pulsewidth(self.CLOSED_PW)
+            elif GPIO_AVAILABLE:
+                self._set_servo_angle(45)
+            self.led.set_closed()
+        self._physical = state
+        print(f"✅ Gate {'OPENED' if state == 'OPEN' else 'CLOSED'}")
+
     # ── gate control (public API) ─────────────────────────────────────────────
     def open_gate(self):
-        """Move servo to open position and switch LED to GREEN."""
+        """Queue a move to the open position (LED → GREEN once it lands)."""
         if self.current_state == "OPEN":
             print("ℹ️  Gate already OPEN")
             return
 
         print("🟢 Opening gate...")
-        if self._pi:
-            self._set_pulsewidth(self.OPEN_PW)
-        elif GPIO_AVAILABLE:
-            self._set_servo_angle(135)
-
         self.current_state = "OPEN"
-        self.led.set_open()
-        print("✅ Gate OPENED")
+        self._commands.put("OPEN")
 
     def close_gate(self):
-        """Move servo to closed position and switch LED to RED."""
+        """Queue a move to the closed position (LED → RED once it lands)."""
         if self.current_state == "CLOSED":
             print("ℹ️  Gate already CLOSED")
             return
 
         print("🔴 Closing gate...")
-        if self._pi:
-            self._set_pulsewidth(self.CLOSED_PW)
-        elif GPIO_AVAILABLE:
-            self._set_servo_angle(45)
-
         self.current_state = "CLOSED"
-        self.led.set_closed()
-        print("✅ Gate CLOSED")
+        self._commands.put("CLOSED")
 
     def set_state(self, state: str):
         if state == "OPEN":
@@ -301,6 +341,9 @@ class GateController:
     def cleanup(self):
         """Release all hardware resources on shutdown."""
         print("🧹 Cleaning up hardware...")
+        # Let a queued move finish before the pins are released
+        self._commands.put(None)
+        self._worker.join(timeout=3)
         self.led.both_off()
 
         if self._pi:
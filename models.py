@@ -13,8 +13,15 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Violation(db.Model):
+    # (type, timestamp): /api/stats "today by type" counts and delete_violations.py
+    # `type` lookups. The leading column also serves plain violation_type filters,
+    # so no separate single-column index on violation_type.
+    __table_args__ = (
+        db.Index('ix_violation_type_ts', 'violation_type', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # /violations sorts on this
     violation_type = db.Column(db.String(100))
     missing_items = db.Column(db.String(200))
     image_path = db.Column(db.String(300))
@@ -46,7 +53,7 @@ class RTSPCamera(db.Model):
 
     id          = db.Column(db.Integer, primary_key=True)
     name        = db.Column(db.String(100), nullable=False)   # e.g. "Gate A Cam"
-    url         = db.Column(db.String(500), nullable=False)   # rtsp://user:pass@ip/stream
+    url         = db.Column(db.String(500), nullable=False, unique=True)   # rtsp://user:pass@ip/stream
     location    = db.Column(db.String(200), default='')       # optional description
     enabled     = db.Column(db.Boolean, default=True)
     added_at    = db.Column(db.DateTime, default=datetime.utcnow)
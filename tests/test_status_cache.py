@@ -0,0 +1,62 @@
+"""
+StatusCache invalidation
+------------------------------------
+• A read after invalidate() must never return a body built from the state
+  before it — even while the background refresh is still mid-build
+"""
+
+import json
+import threading
+import unittest
+
+from utils.status_cache import StatusCache
+
+
+class InvalidateDuringRefreshTest(unittest.TestCase):
+
+    def setUp(self):
+        self.state        = {"relay": "CLOSED"}
+        self.refresher    = None
+        self.snapshotted  = threading.Event()
+        self.release      = threading.Event()
+        self.cache        = StatusCache(encode=lambda obj: json.dumps(obj).encode())
+        self.cache.register("status", self._build_status)
+
+    def _build_status(self):
+        body = dict(self.state)   # state read first, like build_status under gate.lock
+        if threading.current_thread() is self.refresher:
+            self.snapshotted.set()
+            self.release.wait(5.0)   # slow builder: still "building" after the POST
+        return body
+
+    def _relay(self):
+        return json.loads(self.cache.payload("status"))["relay"]
+
+    def test_read_after_invalidate_during_slow_refresh(self):
+        self.assertEqual(self._relay(), "CLOSED")
+
+        self.refresher = threading.Thread(target=self.cache.refresh)
+        self.refresher.start()
+        self.assertTrue(self.snapshotted.wait(5.0))
+
+        # POST: gate opens, then the cache is invalidated while the refresh is mid-build
+        self.state["relay"] = "OPEN"
+        self.cache.invalidate()
+        self.assertEqual(self._relay(), "OPEN")
+
+        # The slow refresh finishes with its pre-POST body — it must not win
+        self.release.set()
+        self.refresher.join(5.0)
+        self.assertEqual(self._relay(), "OPEN")
+
+    def test_background_refresh_serves_cached_body(self):
+        calls = []
+        self.cache.register("events", lambda: calls.append(1) or [])
+        self.cache.refresh()
+        self.cache.payload("events")
+        self.cache.payload("events")
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+ViolationWriter commit retries
+------------------------------------
+• A second sqlite3 connection holds the write lock the way a maintenance
+  purge does; the writer must retry and land the batch once it is released
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from flask import Flask
+
+from models import db, Violation
+from utils.violation_writer import ViolationWriter
+
+
+def _row(n):
+    return dict(timestamp=datetime(2024, 1, 1, 12, 0, n), violation_type="manual_override",
+                missing_items="helmet", gate_action="MANUAL_OPEN", notes=f"row {n}")
+
+
+class ViolationWriterRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{self.db_path}"
+        # Fail fast on a held lock so the writer's own retry is what gets exercised
+        self.app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 0.05}}
+        db.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+
+        self.writer = ViolationWriter(self.app)
+        self.writer.RETRY_BACKOFF = 0.05
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        os.remove(self.db_path)
+
+    def _hold_write_lock(self, seconds):
+        locker = sqlite3.connect(self.db_path, check_same_thread=False)
+        locker.execute("BEGIN IMMEDIATE")
+        timer = threading.Timer(seconds, lambda: (locker.rollback(), locker.close()))
+        timer.start()
+        return timer
+
+    def _count(self):
+        with self.app.app_context():
+            return db.session.query(Violation).count()
+
+    def test_retries_until_lock_is_released(self):
+        timer = self._hold_write_lock(0.3)
+        self.writer._commit([_row(1), _row(2)])
+        timer.join()
+        self.assertEqual(self._count(), 2)
+
+    def test_drops_batch_after_retry_limit(self):
+        self.writer.RETRY_LIMIT = 2
+        timer = self._hold_write_lock(0.5)
+        self.writer._commit([_row(1)])
+        timer.join()
+        self.assertEqual(self._count(), 0)
+
+        self.writer._commit([_row(3)])   # session still usable after the rollback
+        self.assertEqual(self._count(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+YOLOProcessor inference loop
+------------------------------------
+• Runs loop() against a fake camera + model (no hardware, no weights)
+• infer_every=2 streams the first frame before any batch has run
+• A backend that rejects batches must not kill the inference thread
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+try:
+    import numpy as np
+    from utils import yolo_detector
+    DEPS_AVAILABLE = True
+except ImportError:
+    DEPS_AVAILABLE = False
+
+
+class _FakeTensor:
+    def __init__(self, array):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+
+class _FakeResult:
+    def __init__(self):
+        self.boxes = mock.Mock(data=_FakeTensor(np.zeros((0, 6), dtype=np.float32)))
+
+
+class _FakeModel:
+    names       = {0: "helmet", 1: "no-helmet"}
+    batch_limit = 16
+
+    def __call__(self, frames, **kwargs):
+        time.sleep(0.02)   # slower than the camera, so in-between frames pile up
+        if not isinstance(frames, list):
+            frames = [frames]
+        return [_FakeResult() for _ in frames]
+
+
+class _StaticBatchModel(_FakeModel):
+    """Like a batch-1 export whose probe was skipped: any real batch raises."""
+
+    def __call__(self, frames, **kwargs):
+        if isinstance(frames, list) and len(frames) > 1:
+            raise RuntimeError("input batch 4 exceeds engine max batch 1")
+        return super().__call__(frames, **kwargs)
+
+
+class _FakeCapture:
+    def read(self):
+        time.sleep(0.005)
+        return True, np.zeros((240, 320, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+@unittest.skipUnless(DEPS_AVAILABLE, "numpy / OpenCV / ultralytics not installed")
+class InferenceLoopTest(unittest.TestCase):
+
+    def _processor(self, model=None, **kwargs):
+        with mock.patch.object(yolo_detector, "load_yolo", return_value=model or _FakeModel()), \
+             mock.patch.object(yolo_detector.YOLOProcessor, "_open_camera",
+                               return_value=_FakeCapture()):
+            return yolo_detector.YOLOProcessor(**kwargs)
+
+    def _run_until_status(self, yolo):
+        thread = threading.Thread(target=yolo.loop, daemon=True)
+        thread.start()
+        try:
+            seq = 0
+            deadline = time.monotonic() + 5.0
+            while seq < 3 and time.monotonic() < deadline:
+                seq = yolo.wait_for_status(seq, timeout=0.5)
+            self.assertGreaterEqual(seq, 3, "inference loop stopped publishing status")
+            self.assertTrue(thread.is_alive())
+            frame, _ = yolo.wait_for_frame(0, timeout=2.0)
+            self.assertTrue(frame)
+        finally:
+            yolo.stop()
+            thread.join(timeout=2.0)
+
+    def test_loop_survives_in_between_frames(self):
+        yolo = self._processor(batch_size=1, infer_every=2)
+        yolo.add_viewer()   # render the in-between frames too
+        self._run_until_status(yolo)
+
+    def test_loop_survives_rejected_batch(self):
+        yolo = self._processor(model=_StaticBatchModel(), batch_size=4)
+        yolo.add_viewer()
+        self._run_until_status(yolo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+# utils/clock.py
+"""
+Wall-clock labels for status payloads
+------------------------------------
+• hms_now() returns the local "HH:MM:SS" string shown as `last_updated`
+• Formatted at most once per second — polls and per-frame emits reuse it
+"""
+
+import time
+
+_hms_cache = (0, "")   # (epoch second, formatted) — swapped as one tuple, so thread-safe
+
+
+def hms_now() -> str:
+    """Current local time as HH:MM:SS, cached per wall-clock second."""
+    global _hms_cache
+    now = int(time.time())
+    sec, text = _hms_cache
+    if now != sec:
+        text = time.strftime('%H:%M:%S', time.localtime(now))
+        _hms_cache = (now, text)
+    return text
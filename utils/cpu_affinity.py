@@ -0,0 +1,25 @@
+# utils/cpu_affinity.py
+"""
+CPU Pinning for Worker Threads
+------------------------------------
+• Opt-in: SPARC_INFER_CPUS / SPARC_CAPTURE_CPUS list core ids, e.g. "2,3"
+• pin_current_thread() pins only the calling thread (Linux sched_setaffinity
+  with pid 0); threads it starts afterwards — e.g. Torch's intra-op pool —
+  inherit the mask
+• Unset, or on a platform without affinity support: no-op
+"""
+
+import os
+
+INFER_CPUS   = "SPARC_INFER_CPUS"     # inference threads (USB + RTSP batch)
+CAPTURE_CPUS = "SPARC_CAPTURE_CPUS"   # camera read / decode threads
+
+
+def pin_current_thread(env_name: str):
+    spec = os.environ.get(env_name, "").strip()
+    if not spec or not hasattr(os, "sched_setaffinity"):
+        return
+    try:
+        os.sched_setaffinity(0, {int(cpu) for cpu in spec.split(",") if cpu.strip()})
+    except (ValueError, OSError) as e:
+        print(f"⚠️ Ignoring {env_name}='{spec}': {e}")
@@ -0,0 +1,161 @@
+# utils/jpeg_codec.py
+"""
+JPEG Encoding
+------------------------------------
+• simplejpeg (optional) binds libjpeg-turbo with SIMD enabled — pip wheels ship
+  NEON on ARM, which OpenCV's bundled libjpeg-turbo is often built without
+• Falls back to cv2.imencode with baseline (non-optimized) Huffman tables
+• SPARC_JPEG_HW (optional, needs PyGObject + GStreamer) names a fixed-function
+  encoder element, e.g. "nvjpegenc" (Jetson), "v4l2jpegenc" (Pi) or
+  "vaapijpegenc quality=80" (Intel). Frames go appsrc → element → appsink; any
+  element properties (quality etc.) are part of the env value. If the pipeline
+  can't be built, or a frame times out, the software encoders take over for
+  good.
+• encode_jpeg() returns bytes, or None if the encoder rejected the frame
+"""
+
+import os
+import threading
+import cv2
+
+try:
+    import simplejpeg
+    SIMPLEJPEG_AVAILABLE = True
+except ImportError:
+    SIMPLEJPEG_AVAILABLE = False
+
+try:
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst
+    Gst.init(None)
+    GST_AVAILABLE = True
+except (ImportError, ValueError):
+    GST_AVAILABLE = False
+
+HW_JPEG_ELEMENT = os.environ.get("SPARC_JPEG_HW", "").strip()
+
+
+# ─────────────────────────────────────────────────────────────
+# Hardware encoder – one GStreamer pipeline per frame size
+# ─────────────────────────────────────────────────────────────
+class _GstJpegEncoder:
+    PIPELINE = (
+        "appsrc name=src is-live=false block=true "
+        "caps=video/x-raw,format=BGR,width={w},height={h},framerate=0/1 ! "
+        "videoconvert ! {element} ! appsink name=sink sync=false"
+    )
+    PULL_TIMEOUT = 1_000_000_000   # ns
+
+    def __init__(self, element, width, height):
+        self._pipeline = Gst.parse_launch(self.PIPELINE.format(w=width, h=height, element=element))
+        self._src      = self._pipeline.get_by_name("src")
+        self._sink     = self._pipeline.get_by_name("sink")
+        self._lock     = threading.Lock()   # one frame in flight: push, then pull its JPEG
+        if self._pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            raise RuntimeError(f"pipeline with '{element}' failed to start")
+
+    def encode(self, frame_bgr):
+        """JPEG bytes for `frame_bgr`, or None if the element timed out."""
+        data = frame_bgr.tobytes()
+        with self._lock:
+            # A sample that arrived after an earlier timeout belongs to an older frame
+            while self._sink.emit("try-pull-sample", 0) is not None:
+                pass
+            self._src.emit("push-buffer", Gst.Buffer.new_wrapped(data))
+            sample = self._sink.emit("try-pull-sample", self.PULL_TIMEOUT)
+        if sample is None:
+            return None
+        buf = sample.get_buffer()
+        return buf.extract_dup(0, buf.get_size())
+
+    def close(self):
+        with self._lock:   # wait out a frame still in flight
+            self._pipeline.set_state(Gst.State.NULL)
+
+
+_hw_encoders = {}                    # (width, height) → _GstJpegEncoder
+_hw_lock     = threading.Lock()
+_hw_enabled  = bool(HW_JPEG_ELEMENT) and GST_AVAILABLE
+
+
+def _hw_encode(frame_bgr):
+    global _hw_enabled
+    height, width = frame_bgr.shape[:2]
+    encoder = _hw_encoders.get((width, height))
+    if encoder is None:
+        with _hw_lock:
+            encoder = _hw_encoders.get((width, height))
+            if encoder is None:
+                if not _hw_enabled:
+                    return None   # disabled while this frame was on its way in
+                try:
+                    encoder = _GstJpegEncoder(HW_JPEG_ELEMENT, width, height)
+                except Exception as e:
+                    print(f"⚠️ Hardware JPEG '{HW_JPEG_ELEMENT}' unavailable ({e}) — using software encoder")
+                    _hw_enabled = False
+                    return None
+                _hw_encoders[(width, height)] = encoder
+    jpeg = encoder.encode(frame_bgr)
+    if jpeg is None:
+        _disable_hw(f"no JPEG within {encoder.PULL_TIMEOUT / 1e9:g}s")
+    return jpeg
+
+
+def _disable_hw(reason):
+    """Switch to the software encoders for good and tear down every pipeline."""
+    global _hw_enabled
+    with _hw_lock:
+        if not _hw_enabled:
+            return   # another thread already did
+        _hw_enabled = False
+        encoders = list(_hw_encoders.values())
+        _hw_encoders.clear()
+    print(f"⚠️ Hardware JPEG '{HW_JPEG_ELEMENT}' stalled ({reason}) — using software encoder")
+    for encoder in encoders:
+        encoder.close()
+
+
+def encode_jpeg(frame_bgr, quality: int):
+    """Encode a BGR frame to JPEG bytes at `quality`."""
+    if _hw_enabled:
+        jpeg = _hw_encode(frame_bgr)   # quality comes from the element's own properties
+        if jpeg:
+            return jpeg
+
+    if SIMPLEJPEG_AVAILABLE:
+        try:
+            return simplejpeg.encode_jpeg(frame_bgr, quality=quality, colorspace="BGR")
+        except ValueError:
+            pass   # non-contiguous view etc. — let OpenCV handle it
+
+    ok, buf = cv2.imencode(".jpg", frame_bgr,
+                           [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 0])
+    return buf.tobytes() if ok else None
+
+
+def opencv_jpeg_simd_enabled():
+    """
+    Whether OpenCV's bundled libjpeg-turbo was built with SIMD.
+    None when the build info doesn't say (e.g. OpenCV linked to a system libjpeg).
+    "SIMD Support Request:" is only what was asked for; "SIMD Support:" is the result.
+    """
+    for line in cv2.getBuildInformation().splitlines():
+        key, _, value = line.strip().partition(":")
+        if key == "SIMD Support":
+            return value.strip() == "YES"
+    return None
+
+
+def log_jpeg_backend():
+    """Print which JPEG encoder is live so the operator can confirm SIMD."""
+    if _hw_enabled:
+        print(f"✅ JPEG encoder: GStreamer {HW_JPEG_ELEMENT} (hardware)")
+    elif HW_JPEG_ELEMENT:
+        print(f"⚠️ SPARC_JPEG_HW='{HW_JPEG_ELEMENT}' ignored — PyGObject / GStreamer not installed")
+    if SIMPLEJPEG_AVAILABLE:
+        print(f"✅ JPEG encoder: simplejpeg {simplejpeg.__version__} (libjpeg-turbo, SIMD)")
+    elif opencv_jpeg_simd_enabled() is False:
+        print("⚠️ JPEG encoder: OpenCV libjpeg-turbo built without SIMD — pip install simplejpeg")
+    else:
+        print("✅ JPEG encoder: OpenCV")
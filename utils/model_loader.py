@@ -0,0 +1,196 @@
+# utils/model_loader.py
+"""
+YOLO Model Loader
+------------------------------------
+• Default: load models/best.pt exactly as before (CPU / PyTorch)
+• SPARC_MODEL_FORMAT selects an accelerator export (e.g. "engine" for TensorRT,
+  "edgetpu" for Coral, "ncnn" for the Pi's ARM CPU, "onnx" / "openvino" for
+  x86 boxes).
+  The export runs once; later boots reuse the artifact until best.pt is
+  replaced with newer weights, which triggers a fresh export. Exports are
+  built in a scratch directory and swapped in only when complete, so a failed
+  re-export keeps the previous artifact.
+• SPARC_MODEL_INT8=1 quantises the export to INT8. TensorRT and OpenVINO
+  calibrate on the dataset YAML in SPARC_MODEL_CALIB_DATA. Otherwise TensorRT /
+  NCNN / OpenVINO are FP16. For an INT8 CPU model use "openvino" — Ultralytics exports
+  ONNX and NCNN as float only.
+• Without the env var an existing export is still picked up: best.engine on a
+  CUDA host, best_ncnn_model/ on an ARM board, best_openvino_model/ on a
+  CPU-only x86 box. An auto-picked export is never rebuilt on its own: newer
+  weights just log a warning (set SPARC_MODEL_FORMAT to re-export)
+• Every loaded model gets one warm-up inference before any thread uses it
+• TensorRT / ONNX / OpenVINO are exported with a dynamic batch axis (up to
+  EXPORT_BATCH). load_yolo() then probes a 2-frame batch and sets
+  `model.batch_limit` — callers cap their batches at it, so a static-shape
+  export (e.g. one built before this) is fed one frame per call.
+  NCNN / Edge TPU only ever run the first image of a batch: always 1.
+• Torch's CPU pool is capped at SPARC_TORCH_THREADS (default 2): the USB and
+  RTSP inference threads and every stream's decoder share the Pi's 4 cores.
+  OpenCV's own pool is already off — Ultralytics calls cv2.setNumThreads(0)
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+import numpy as np
+from ultralytics import YOLO
+
+try:
+    import torch
+    CUDA_AVAILABLE = torch.cuda.is_available()
+    if CUDA_AVAILABLE:
+        torch.backends.cudnn.benchmark = True   # input shape is fixed at IMGSZ
+    torch.set_num_threads(int(os.environ.get("SPARC_TORCH_THREADS", "2")))
+except ImportError:
+    CUDA_AVAILABLE = False
+
+# Where `YOLO.export(format=...)` writes its artifact, relative to best.pt's stem
+EXPORT_PATHS = {
+    "engine":   "{stem}.engine",
+    "edgetpu":  "{stem}_saved_model/{stem}_full_integer_quant_edgetpu.tflite",
+    "ncnn":     "{stem}_ncnn_model",
+    "onnx":     "{stem}.onnx",
+    "openvino": "{stem}{int8}_openvino_model",   # "_int8" suffix on an INT8 export
+}
+
+# Formats whose export takes half=True (FP16 weights) when INT8 is not requested
+HALF_EXPORTS = {"engine", "ncnn", "openvino"}
+
+# Formats exported with dynamic=True, batch=EXPORT_BATCH. EXPORT_BATCH is the
+# largest batch any caller sends (RTSPManager.MAX_BATCH).
+DYNAMIC_EXPORTS = {"engine", "onnx", "openvino"}
+EXPORT_BATCH    = 16
+
+# Backends that silently return one result for a whole batch — no probe, one frame per call
+SINGLE_FRAME_FORMATS = {"ncnn", "edgetpu"}
+
+IMGSZ = 320   # must match the imgsz used at inference time
+
+# Export reused automatically when SPARC_MODEL_FORMAT is unset
+if CUDA_AVAILABLE:
+    DEFAULT_FORMAT = "engine"
+elif platform.machine() in ("aarch64", "armv7l"):
+    DEFAULT_FORMAT = "ncnn"
+elif platform.machine() in ("x86_64", "AMD64"):
+    DEFAULT_FORMAT = "openvino"   # CPU-only x86 unit / iGPU
+else:
+    DEFAULT_FORMAT = None
+
+# Shared predict() kwargs. On a CUDA host FP16 halves the host→device copy and
+# Ultralytics runs the /255 normalise on the GPU; the Pi stays on FP32 CPU.
+PREDICT_ARGS = {"verbose": False, "imgsz": IMGSZ, "half": CUDA_AVAILABLE}
+
+
+def exported_path(model_path: str, fmt: str, int8: bool = False) -> str:
+    """Path of the exported model that `fmt` produces for `model_path`."""
+    base, _ = os.path.splitext(model_path)
+    folder, stem = os.path.split(base)
+    return os.path.join(folder, EXPORT_PATHS[fmt].format(stem=stem, int8="_int8" if int8 else ""))
+
+
+def warm_up(model: YOLO) -> YOLO:
+    """
+    One dummy inference: fuses layers / builds the engine context ONCE, before
+    detector threads start — otherwise they race to do it on first use.
+    """
+    model(np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8), **PREDICT_ARGS)
+    return model
+
+
+def _probe_batch(model: YOLO) -> int:
+    """EXPORT_BATCH if a 2-frame call returns one result per frame, else 1."""
+    blank = np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8)
+    try:
+        if len(model([blank, blank], **PREDICT_ARGS)) == 2:
+            return EXPORT_BATCH
+    except Exception:
+        pass   # static batch-1 engine / ONNX / OpenVINO rejects the shape
+    return 1
+
+
+def load_yolo(model_path: str = "models/best.pt") -> YOLO:
+    """
+    Load the detector, exporting it for the configured accelerator first if needed.
+    Falls back to the plain .pt weights if the export fails on this machine.
+    `model.batch_limit` is the most frames a single model() call may carry.
+    """
+    model, fmt = _load(model_path)
+    warm_up(model)
+    model.batch_limit = 1 if fmt in SINGLE_FRAME_FORMATS else _probe_batch(model)
+    if model.batch_limit == 1:
+        print(f"⚠️ {fmt or 'model'} backend takes one frame per call — batching disabled")
+    return model
+
+
+def _load(model_path: str):
+    """(YOLO, export format or None when the weights are loaded as-is)."""
+    fmt  = os.environ.get("SPARC_MODEL_FORMAT", "").strip().lower()
+    int8 = os.environ.get("SPARC_MODEL_INT8", "") == "1"
+    auto = False
+    if not fmt and DEFAULT_FORMAT and model_path.endswith(".pt") \
+            and os.path.exists(exported_path(model_path, DEFAULT_FORMAT, int8)):
+        fmt  = DEFAULT_FORMAT   # previously exported for this platform — use it
+        auto = True
+    if not fmt or not model_path.endswith(".pt"):
+        return YOLO(model_path), None
+
+    if fmt not in EXPORT_PATHS:
+        print(f"⚠️ Unknown SPARC_MODEL_FORMAT '{fmt}' — using {model_path}")
+        return YOLO(model_path), None
+
+    target = exported_path(model_path, fmt, int8)
+    exists = os.path.exists(target)
+    stale  = exists and os.path.getmtime(target) < os.path.getmtime(model_path)
+    if stale and auto:
+        # Never start a multi-minute export at boot for a format nobody asked for
+        print(f"⚠️ {model_path} is newer than {target} — still using the old export; "
+              f"set SPARC_MODEL_FORMAT={fmt} to rebuild it")
+    elif stale or not exists:
+        print(f"🔄 Exporting {model_path} → {fmt}{' INT8' if int8 else ''} "
+              f"({'weights changed' if stale else 'one-time'})…")
+        try:
+            _export(model_path, fmt, int8)
+        except Exception as e:
+            if not stale:
+                print(f"❌ Export to {fmt} failed ({e}) — using {model_path}")
+                return YOLO(model_path), None
+            print(f"❌ Re-export to {fmt} failed ({e}) — keeping the previous {target}")
+
+    print(f"✅ Using {fmt} model: {target}")
+    return YOLO(target, task="detect"), fmt
+
+
+def _export(model_path: str, fmt: str, int8: bool):
+    """
+    Export a copy of the weights inside a scratch directory next to them, then
+    move the finished artifact over the old one — a failed export (no pnnx,
+    TensorRT OOM, …) leaves the previous artifact untouched.
+    """
+    export_args = {"format": fmt, "imgsz": IMGSZ, "int8": int8,
+                   "half": fmt in HALF_EXPORTS and not int8}
+    if fmt in DYNAMIC_EXPORTS:
+        export_args.update(dynamic=True, batch=EXPORT_BATCH)
+    calib_data = os.environ.get("SPARC_MODEL_CALIB_DATA")
+    if int8 and calib_data:
+        export_args["data"] = calib_data
+
+    folder = os.path.dirname(model_path) or "."
+    rel    = os.path.relpath(exported_path(model_path, fmt, int8), folder)
+    top    = rel.split(os.sep)[0]   # the file, or the directory the export writes into
+    with tempfile.TemporaryDirectory(prefix=".export-", dir=folder) as scratch:
+        scratch_pt = os.path.join(scratch, os.path.basename(model_path))
+        shutil.copy2(model_path, scratch_pt)
+        YOLO(scratch_pt).export(**export_args)
+        if not os.path.exists(os.path.join(scratch, rel)):
+            raise RuntimeError(f"export did not produce {rel}")
+
+        built, dest = os.path.join(scratch, top), os.path.join(folder, top)
+        if os.path.isdir(dest):
+            old = dest + ".old"
+            shutil.rmtree(old, ignore_errors=True)
+            os.rename(dest, old)
+            os.rename(built, dest)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.replace(built, dest)
@@ -0,0 +1,74 @@
+# utils/ppe_classes.py
+"""
+PPE Class Tables
+------------------------------------
+• Built once from `model.names` when a detector starts, shared by the USB
+  (yolo_detector) and CCTV (rtsp_processor) paths
+• to_host() copies a frame's boxes off the device ONCE; ppe_mask() and
+  draw_detections() both work on that (N, 6) array
+• ppe_mask() folds the detections into one bitmask — no label strings
+• draw_detections() draws every box of a colour with one cv2.polylines call
+"""
+
+import cv2
+import numpy as np
+
+# PPE label → bit in the per-frame detection mask (singular/plural labels share a bit)
+PPE_BITS = {
+    "helmet":    1,  "gloves":    2,  "glove":    2,  "boots":    4,
+    "no-helmet": 8,  "no-gloves": 16, "no-glove": 16, "no-boots": 32,
+}
+HELMET, GLOVES, BOOTS, NO_HELMET, NO_GLOVES, NO_BOOTS = 1, 2, 4, 8, 16, 32
+VIOLATION_BITS = NO_HELMET | NO_GLOVES | NO_BOOTS
+
+BOX_COLORS = ((0, 255, 0), (0, 0, 255), (0, 255, 255))   # BGR: PPE worn, PPE missing, other
+
+
+class PPEClasses:
+    """Per-model lookup tables indexed by class id."""
+
+    def __init__(self, names):
+        size        = max(names) + 1
+        self.labels = tuple(names.get(i, str(i)) for i in range(size))
+        self.bits   = np.zeros(size, dtype=np.uint32)
+        self.groups = np.full(size, 2, dtype=np.intp)   # index into BOX_COLORS
+        for cls_id, label in enumerate(self.labels):
+            self.bits[cls_id] = PPE_BITS.get(label, 0)
+            if label in ("helmet", "gloves", "glove", "boots"):
+                self.groups[cls_id] = 0
+            elif label.startswith("no-"):
+                self.groups[cls_id] = 1
+
+    @staticmethod
+    def to_host(boxes) -> np.ndarray:
+        """Ultralytics Boxes → (N, 6) [x1, y1, x2, y2, conf, cls] array in one copy."""
+        return boxes.data.cpu().numpy()
+
+    def ppe_mask(self, det) -> int:
+        """OR of the PPE bits of every detection in `det` (a to_host() array)."""
+        cls_ids = det[:, -1].astype(np.intp)
+        return int(np.bitwise_or.reduce(self.bits[cls_ids])) if cls_ids.size else 0
+
+    def draw_detections(self, frame, det):
+        """Boxes + "label conf" text from a to_host() array, coloured by PPE group."""
+        if not len(det):
+            return
+
+        # conf / cls are the last two columns (a tracker id would sit before them)
+        xyxy   = det[:, :4].astype(np.int32)
+        conf   = det[:, -2]
+        cls    = det[:, -1].astype(np.intp)
+        groups = self.groups[cls]
+
+        # (N, 4, 2) rectangle corners; one polylines call per colour
+        corners = xyxy[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+        for group, color in enumerate(BOX_COLORS):
+            selected = groups == group
+            if selected.any():
+                cv2.polylines(frame, list(corners[selected]), True, color, 2)
+
+        labels = self.labels
+        for (x1, y1, _, _), cls_id, score, group in zip(xyxy.tolist(), cls.tolist(),
+                                                         conf.tolist(), groups.tolist()):
+            cv2.putText(frame, f"{labels[cls_id]} {score:.2f}", (x1, y1 - 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, BOX_COLORS[group], 2)
@@ -2,7 +2,9 @@
 """
 RTSP / CCTV Multi-Camera Processor
 ------------------------------------
-• Each RTSPStream runs its own capture + YOLO thread
+• Each RTSPStream runs its own capture thread
+• RTSPManager runs ONE inference thread that batches the newest frame from
+  every stream into a single YOLO forward pass
 • Automatic reconnection on stream drop (configurable interval)
 • Violations are logged to the same Violation table as the USB camera
 • RTSPManager is the single object app.py imports – it owns all streams
@@ -12,9 +14,19 @@ import cv2
 import threading
 import time
 import os
+import random
+import itertools
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import MappingProxyType
 from ultralytics import YOLO
+from utils.model_loader import load_yolo, PREDICT_ARGS
+from utils.jpeg_codec import encode_jpeg
+from utils.clock import hms_now
+from utils.cpu_affinity import pin_current_thread, INFER_CPUS, CAPTURE_CPUS
+from utils.ppe_classes import (PPEClasses, HELMET, GLOVES, BOOTS,
+                               NO_HELMET, NO_GLOVES, NO_BOOTS, VIOLATION_BITS)
 
 try:
     from models import db, Violation, RTSPCamera, YardAlert
@@ -33,26 +45,88 @@ class RTSPStream:
     logs violations, and exposes the annotated JPEG frame.
     """
 
-    RECONNECT_INTERVAL = 7   # seconds between reconnection attempts
+    RECONNECT_INTERVAL = 7    # seconds before the first reconnection attempt
+    RECONNECT_MAX      = 120  # backoff ceiling while a camera stays unreachable
     STARTUP_GRACE      = 5.0  # seconds to suppress logging after (re)connect
 
+    # Frames per second handed to the batch thread, by what the camera last saw:
+    # an empty scene is polled slowly, a worker in view faster, and a violation
+    # keeps the stream at full rate for ALERT_HOLD seconds
+    INFER_FPS   = {"UNKNOWN": 2, "OK": 5, "NOT_OK": 10}
+    ALERT_HOLD  = 30
+    # Frames per second retrieved + encoded for viewers, whatever the inference
+    # rate: frames between inferences are drawn with the last detections
+    DISPLAY_FPS = 10
+
+    # Static-scene skip: a frame whose 8×8 grey thumbnail differs from the last
+    # inferred one by less than STATIC_SAD (sum of abs diffs) reuses that
+    # frame's detections; inference still runs at least every FORCE_INFER_AFTER s
+    STATIC_SAD        = 200
+    FORCE_INFER_AFTER = 2.0
+
+    JPEG_QUALITY          = 85   # live stream
+    MAX_FRAME_WIDTH       = 640  # CCTV frames are downscaled to this once, up front
+    SNAPSHOT_JPEG_QUALITY = 60   # auto-capture files
+
+    # FFmpeg demux/decode options (pipe-separated, as OpenCV expects).
+    # threads;3 lets the H.264 decoder use more than one core per stream.
+    # SPARC_RTSP_VIDEO_CODEC picks a specific decoder, e.g. h264_v4l2m2m on a Pi.
+    FFMPEG_CAPTURE_OPTIONS = (
+        "rtsp_transport;tcp"
+        "|timeout;60000000"
+        "|flags;+discardcorrupt"   # silently drop undecodable frames
+        "|threads;3"
+        + (f"|video_codec;{os.environ['SPARC_RTSP_VIDEO_CODEC']}"
+           if os.environ.get("SPARC_RTSP_VIDEO_CODEC") else "")
+    )
+
+    # GStreamer hardware decode (opt-in, needs OpenCV built with GStreamer).
+    # SPARC_RTSP_GST_DECODE is the depay ! parse ! decoder chain for the
+    # platform, e.g. "rtph264depay ! h264parse ! v4l2h264dec" on a Pi or
+    # "rtph264depay ! h264parse ! nvv4l2decoder ! nvvidconv" on a Jetson.
+    # appsink keeps only the newest buffer, so no stale frames queue up.
+    GST_DECODE   = os.environ.get("SPARC_RTSP_GST_DECODE", "").strip()
+    GST_PIPELINE = (
+        "rtspsrc location=\"{url}\" latency=200 protocols=tcp ! {decode} ! "
+        "videoconvert ! video/x-raw,format=BGR ! "
+        "appsink drop=true max-buffers=1 sync=false"
+    )
+
     def __init__(self, camera_id: int, name: str, url: str,
-                 model: YOLO, flask_app, violations_dir: str, socketio=None):
+                 model: YOLO, flask_app, violations_dir: str, socketio=None,
+                 violation_writer=None, frame_ready: threading.Condition = None,
+                 io_executor: ThreadPoolExecutor = None):
         self.camera_id      = camera_id
         self.name           = name
         self.url            = url
         self.model          = model
+        self._classes       = PPEClasses(model.names)   # per-class lookup tables, built once
         self.flask_app      = flask_app
         self.violations_dir = violations_dir
         self.socketio       = socketio
+        self.violation_writer = violation_writer   # optional batched Violation inserts
+        self._io_executor   = io_executor          # auto-capture saves, off the inference thread
 
         self.latest_frame: bytes | None = None
-        self.latest_status = {
+        self._frame_cond = threading.Condition()   # wakes MJPEG viewers on each new frame
+        self._frame_seq  = 0
+        self._tickets          = itertools.count(1)   # per render; next() is thread-safe
+        self._published_ticket = 0   # newest ticket published — encoders may finish out of order
+        self._last_det         = None   # host detections reused for frames not inferred
+        self._ref_thumb        = None   # thumbnail of the last frame sent to inference
+        self._force_infer_at   = 0.0
+        # Inference is batched by RTSPManager: this thread only leaves its newest
+        # frame in _pending and notifies frame_ready (the manager's condition)
+        self._frame_ready = frame_ready or threading.Condition()
+        self._pending     = None
+        # Read-only snapshot, rebound (never mutated) after each inference — the
+        # Flask thread reading it in get_status() never sees half an update
+        self.latest_status = MappingProxyType({
             "ppe_status": "UNKNOWN",
             "helmet": False, "gloves": False, "boots": False,
             "no_helmet": False, "no_gloves": False, "no_boots": False,
             "has_violation": False,
-        }
+        })
 
         self._running    = False
         self._thread     = None
@@ -60,6 +134,8 @@ class RTSPStream:
         self._connected  = False
         self.fps         = 0.0
         self.prev_status = "UNKNOWN"
+        self._alert_until = 0.0   # monotonic time the NOT_OK inference rate is held until
+        self._reconnect_failures = 0
 
         # Auto-capture: cooldown prevents flooding disk/DB
         self.AUTO_CAPTURE_COOLDOWN = 30   # seconds between auto-saves per stream
@@ -85,8 +161,59 @@ class RTSPStream:
         """Return the latest annotated JPEG bytes (None if not yet available)."""
         return self.latest_frame
 
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """
+        Block until a frame newer than `last_seq` is published.
+        Returns (frame, seq) — frame is None if the timeout expired first.
+        """
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self._frame_seq != last_seq, timeout=timeout)
+            if self._frame_seq == last_seq:
+                return None, last_seq
+            return self.latest_frame, self._frame_seq
+
     # ── internal loop ────────────────────────────────────────
+    def _downscale(self, frame):
+        """
+        Shrink 1080p/4K CCTV frames to MAX_FRAME_WIDTH with one INTER_AREA pass
+        (OpenCV's SIMD path) so letterboxing, box drawing and JPEG encoding all
+        work on a fraction of the pixels.
+        """
+        h, w = frame.shape[:2]
+        if w <= self.MAX_FRAME_WIDTH:
+            return frame
+        scale = self.MAX_FRAME_WIDTH / w
+        return cv2.resize(frame, (self.MAX_FRAME_WIDTH, round(h * scale)),
+                          interpolation=cv2.INTER_AREA)
+
+    def _is_static(self, frame, now):
+        """True if `frame` barely differs from the last inferred frame (see STATIC_SAD)."""
+        small = cv2.resize(frame, (8, 8), interpolation=cv2.INTER_AREA)
+        thumb = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+        if (self._ref_thumb is not None and self._last_det is not None
+                and now < self._force_infer_at
+                and int(np.abs(thumb - self._ref_thumb).sum()) < self.STATIC_SAD):
+            return True
+        self._ref_thumb      = thumb
+        self._force_infer_at = now + self.FORCE_INFER_AFTER
+        return False
+
+    def _min_interval(self, now):
+        """Seconds between frames handed to inference, from the current activity."""
+        status = "NOT_OK" if now < self._alert_until else self.prev_status
+        return 1.0 / self.INFER_FPS.get(status, self.INFER_FPS["UNKNOWN"])
+
+    def _reconnect_delay(self):
+        """
+        Exponential backoff with ±20 % jitter — after a switch reboot the cameras
+        don't all retry in lock-step.
+        """
+        delay = min(self.RECONNECT_MAX, self.RECONNECT_INTERVAL * 2 ** self._reconnect_failures)
+        self._reconnect_failures += 1
+        return delay * random.uniform(0.8, 1.2)
+
     def _loop(self):
+        pin_current_thread(CAPTURE_CPUS)
         while self._running:
             cap = self._open_capture()
             if cap is None:
@@ -98,17 +225,27 @@ class RTSPStream:
                         "ppe_status":  "OFFLINE",
                         "fps":         0,
                     })
-                time.sleep(self.RECONNECT_INTERVAL)
+                time.sleep(self._reconnect_delay())
                 continue
 
             self._connected  = True
             self._start_time = time.time()
             prev_time        = time.time()
-            frame_count      = 0
+            next_retrieve    = 0.0
+            next_infer       = 0.0
+            self._reconnect_failures = 0
             print(f"✅ Connected to RTSP stream: {self.name} ({self.url})")
 
             while self._running:
-                ok, frame = cap.read()
+                # grab() every frame to keep the decoder current, but only
+                # retrieve() (colour-convert + copy out) at DISPLAY_FPS
+                ok = cap.grab()
+                if ok:
+                    now = time.monotonic()
+                    if now < next_retrieve:
+                        continue
+                    ok, frame = cap.retrieve()
+                    next_retrieve = now + 1.0 / self.DISPLAY_FPS
                 if not ok:
                     print(f"⚠️ Lost connection to {self.name}, reconnecting…")
                     self._connected = False
@@ -122,47 +259,103 @@ class RTSPStream:
                         })
                     break
                 
-                frame_count += 1
-                if frame_count % 3 != 0:      # process every other frame
+                frame = self._downscale(frame)
+                # Inference only at the activity rate, once the batch thread has
+                # taken the last frame, and not for an unchanged scene
+                if (now < next_infer or self._pending is not None
+                        or self._is_static(frame, now)):
+                    # Fresh pixels for viewers, previous boxes, no inference
+                    self._render(frame, self._last_det, next(self._tickets))
                     continue
-                
-                results = self.model(frame, verbose=False, imgsz=320, conf=0.6, iou=0.6)[0]
-                self._process_results(results)
-                self._draw_boxes(frame, results)
-
-		
-                #curr_time  = time.time()
-                #self.fps   = round(1 / max(curr_time - prev_time, 1e-6), 1)
-                #prev_time  = curr_time
-
-                # Overlay: camera name + fps (disabled)
-                #cv2.putText(frame, f"{self.name} | FPS:{self.fps}",
-                #             (10, 30), cv2.FONT_HERSHEY_SIMPLEX,
-                #             0.8, (0, 255, 0), 2)
-                ret, jpeg = cv2.imencode(".jpg", frame)
-                if ret:
-                    self.latest_frame = jpeg.tobytes()
+                next_infer = now + self._min_interval(now)
+                with self._frame_ready:
+                    self._pending = frame   # slot was empty — only the batch thread clears it
+                    self._frame_ready.notify()
 
             cap.release()
             if self._running:
-                time.sleep(self.RECONNECT_INTERVAL)
+                time.sleep(self._reconnect_delay())
 
         self._connected = False
 
+    def finish_frame(self, frame, results, encoder=None):
+        """
+        Called by RTSPManager's batch thread with this stream's inference result.
+        Status is updated here; box drawing + JPEG encoding go to `encoder`
+        (an executor) when given, so the next batch isn't held up by them.
+        """
+        det = self._classes.to_host(results.boxes)   # the only device→host copy
+        capture = self._process_results(det)
+        self._last_det = det
+        ticket = next(self._tickets)
+        if encoder is None:
+            self._render(frame, det, ticket, capture)
+        else:
+            encoder.submit(self._render, frame, det, ticket, capture)
+
+    def _render(self, frame, det, ticket, capture=None):
+        """
+        Draw + encode one frame and publish it. `capture` is the auto-capture
+        claimed by _process_results for this frame — saved from it once drawn.
+        """
+        try:
+            self._draw_boxes(frame, det)
+            if capture:
+                self._submit_auto_capture(frame, *capture)
+                capture = None
+
+            #curr_time  = time.time()
+            #self.fps   = round(1 / max(curr_time - prev_time, 1e-6), 1)
+            #prev_time  = curr_time
+
+            # Overlay: camera name + fps (disabled)
+            #cv2.putText(frame, f"{self.name} | FPS:{self.fps}",
+            #             (10, 30), cv2.FONT_HERSHEY_SIMPLEX,
+            #             0.8, (0, 255, 0), 2)
+            jpeg = encode_jpeg(frame, self.JPEG_QUALITY)
+        except Exception as e:
+            print(f"❌ RTSP render error [{self.name}]: {e}")
+            if capture:
+                self._last_auto_capture = capture[1]   # never queued — hand the cooldown back
+            return
+
+        if jpeg:
+            with self._frame_cond:
+                if ticket < self._published_ticket:
+                    return   # a newer frame was already published
+                self._published_ticket = ticket
+                self.latest_frame = jpeg
+                self._frame_seq  += 1
+                self._frame_cond.notify_all()
+
+    def _open_gstreamer(self):
+        """HW-decode pipeline from GST_DECODE; None if unset or it won't open."""
+        if not self.GST_DECODE:
+            return None
+        pipeline = self.GST_PIPELINE.format(url=self.url, decode=self.GST_DECODE)
+        cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+        if cap.isOpened():
+            print(f"✅ {self.name}: GStreamer hardware decode")
+            return cap
+        cap.release()
+        print(f"⚠️ {self.name}: GStreamer pipeline failed to open — falling back to FFmpeg")
+        return None
+
     def _open_capture(self):
         """Try to open the RTSP stream; return cap object or None."""
         try:
-            # Must be set BEFORE VideoCapture() — FFmpeg reads this at open time
-            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = (
-                "rtsp_transport;tcp"
-                "|timeout;60000000"
-                "|flags;+discardcorrupt"   # silently drop undecodable frames
-            )
-
-            cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
-            cap.set(cv2.CAP_PROP_BUFFERSIZE, 3)
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH,  640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            cap = self._open_gstreamer()
+            if cap is None:
+                # Must be set BEFORE VideoCapture() — FFmpeg reads this at open time
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = self.FFMPEG_CAPTURE_OPTIONS
+
+                # HW_ACCELERATION_ANY: use VAAPI / CUDA / V4L2 M2M decode where the
+                # FFmpeg build has it, silently fall back to software otherwise
+                cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG,
+                                       [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # newest frame only — no queue build-up
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH,  640)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
 
             if not cap.isOpened():
                 print(f"❌ Cannot open RTSP URL: {self.url}")
@@ -192,18 +385,19 @@ class RTSPStream:
             return None
 
     # ── YOLO processing (mirrors yolo_detector.py logic) ────
-    def _process_results(self, results):
-        names   = self.model.names
-        classes = [names[int(b.cls)] for b in results.boxes]
+    def _process_results(self, det):
+        """Update status from `det`; returns the auto-capture it claimed, if any."""
+        # OR every detection's PPE bit together in one vectorised pass
+        mask = self._classes.ppe_mask(det)
 
-        helmet    = "helmet"    in classes
-        gloves    = ("gloves"   in classes) or ("glove" in classes)
-        boots     = "boots"     in classes
-        no_helmet = "no-helmet" in classes
-        no_gloves = ("no-gloves" in classes) or ("no-glove" in classes)
-        no_boots  = "no-boots"  in classes
+        helmet    = bool(mask & HELMET)
+        gloves    = bool(mask & GLOVES)
+        boots     = bool(mask & BOOTS)
+        no_helmet = bool(mask & NO_HELMET)
+        no_gloves = bool(mask & NO_GLOVES)
+        no_boots  = bool(mask & NO_BOOTS)
 
-        has_violation = no_helmet or no_gloves or no_boots
+        has_violation = bool(mask & VIOLATION_BITS)
 
         if has_violation:
             new_status = "NOT_OK"
@@ -226,11 +420,13 @@ class RTSPStream:
                     "no_gloves":    no_gloves,
                     "no_boots":     no_boots,
                     "has_violation": has_violation,
-                    "last_updated": datetime.now().strftime('%H:%M:%S')
+                    "last_updated": hms_now()
                 })
 
         self.prev_status = new_status
-        self.latest_status.update({
+        if has_violation:
+            self._alert_until = time.monotonic() + self.ALERT_HOLD
+        self.latest_status = MappingProxyType({
             "ppe_status":   new_status,
             "helmet":       helmet,
             "gloves":       gloves,
@@ -247,84 +443,86 @@ class RTSPStream:
             if no_helmet: missing.append("helmet")
             if no_gloves: missing.append("gloves")
             if no_boots:  missing.append("boots")
-            self._auto_capture_violation(missing)
-
-    def _draw_boxes(self, frame, results):
-        for b in results.boxes:
-            x1, y1, x2, y2 = map(int, b.xyxy[0])
-            cls_id     = int(b.cls)
-            conf       = float(b.conf)
-            class_name = self.model.names[cls_id]
-            label      = f"{class_name} {conf:.2f}"
-
-            if class_name in ("helmet", "gloves", "glove", "boots"):
-                color = (0, 255, 0)
-            elif class_name.startswith("no-"):
-                color = (0, 0, 255)
-            else:
-                color = (0, 255, 255)
-
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, label, (x1, y1 - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            return self._auto_capture_violation(missing)
+        return None
+
+    def _draw_boxes(self, frame, det):
+        if det is not None:   # None until the first inference after (re)connect
+            self._classes.draw_detections(frame, det)
 
     def _auto_capture_violation(self, missing_items: list):
         """
-        Auto-saves a violation frame + DB record when YOLO detects a PPE breach.
-        Cooldown (AUTO_CAPTURE_COOLDOWN) prevents flooding disk and DB.
-        Respects the startup grace period used by the stream.
-        Image saved at 60% JPEG quality (~30-50 KB each).
+        Claims an auto-capture when YOLO detects a PPE breach: returns
+        (missing_items, prev_capture) for _render to save from the frame it just
+        drew, or None. Cooldown (AUTO_CAPTURE_COOLDOWN) prevents flooding disk
+        and DB. Respects the startup grace period used by the stream.
         """
         now = time.time()
 
         # Respect startup grace — _start_time is set on each (re)connect
         if self._start_time and (now - self._start_time) < self.STARTUP_GRACE:
-            return
+            return None
 
         # Cooldown guard — one capture per camera per COOLDOWN window
         if (now - self._last_auto_capture) < self.AUTO_CAPTURE_COOLDOWN:
-            return
+            return None
 
-        if not isinstance(self.latest_frame, bytes) or len(self.latest_frame) == 0:
-            return
+        # Claim the cooldown window now so the frames inferred while the save is
+        # queued don't submit duplicates; a failed save hands it back
+        prev_capture, self._last_auto_capture = self._last_auto_capture, now
+        return missing_items, prev_capture
 
+    def _submit_auto_capture(self, frame_np, missing_items: list, prev_capture: float):
+        """Queue the save of an annotated violating frame (60% JPEG, ~30-50 KB)."""
+        if self._io_executor:
+            self._io_executor.submit(self._save_auto_capture, frame_np, missing_items, prev_capture)
+        else:
+            self._save_auto_capture(frame_np, missing_items, prev_capture)
+
+    def _save_auto_capture(self, frame_np, missing_items: list, prev_capture: float):
+        """Encode + write the snapshot, then log the Violation / YardAlert and notify."""
         timestamp  = datetime.now()
         ts_str     = timestamp.strftime("%Y%m%d_%H%M%S")
         filename   = f"rtsp_auto_{self.camera_id}_{ts_str}.jpg"
         saved      = False
 
         try:
-            os.makedirs(self.violations_dir, exist_ok=True)
-            nparr    = np.frombuffer(self.latest_frame, np.uint8)
-            frame_np = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if frame_np is not None:
-                path  = os.path.join(self.violations_dir, filename)
-                saved = cv2.imwrite(path, frame_np, [cv2.IMWRITE_JPEG_QUALITY, 60])
+            # Re-encode at 60% straight from the annotated frame still in memory —
+            # no JPEG decode (and no decode buffer allocation) per capture
+            jpeg = encode_jpeg(frame_np, self.SNAPSHOT_JPEG_QUALITY)
+            if jpeg:
+                with open(os.path.join(self.violations_dir, filename), "wb") as f:
+                    f.write(jpeg)
+                saved = True
         except Exception as e:
             print(f"❌ Auto-capture save error [{self.name}]: {e}")
-            return
+            saved = False
 
         if not saved:
+            self._last_auto_capture = prev_capture   # retry on the next violating frame
             return
 
-        self._last_auto_capture = now   # update only after a successful save
+        fields = dict(
+            timestamp      = timestamp,
+            violation_type = "rtsp_auto_capture",
+            missing_items  = ", ".join(missing_items) if missing_items else "N/A",
+            image_path     = filename,
+            gate_action    = "RTSP_AUTO",
+            operator_id    = None,
+            notes          = (
+                f"[CCTV:{self.name}] Auto-detected PPE violation. "
+                f"Missing: {', '.join(missing_items)}"
+            ),
+        )
 
         try:
             with self.flask_app.app_context():
-                # Existing violation record (unchanged)
-                record = Violation(
-                    timestamp      = timestamp,
-                    violation_type = "rtsp_auto_capture",
-                    missing_items  = ", ".join(missing_items) if missing_items else "N/A",
-                    image_path     = filename,
-                    gate_action    = "RTSP_AUTO",
-                    operator_id    = None,
-                    notes          = (
-                        f"[CCTV:{self.name}] Auto-detected PPE violation. "
-                        f"Missing: {', '.join(missing_items)}"
-                    ),
-                )
-                db.session.add(record)
+                # Violation row goes through the batched writer; the yard alert
+                # stays synchronous because its id is emitted below
+                if self.violation_writer:
+                    self.violation_writer.submit(**fields)
+                else:
+                    db.session.add(Violation(**fields))
 
                 # New yard alert record for acknowledgement tracking
                 alert = YardAlert(
@@ -366,28 +564,26 @@ class RTSPStream:
         Called manually by supervisor via the dashboard button.
         Reads current frame + PPE status at time of click.
         """
+        status        = self.latest_status   # one consistent snapshot
         missing_items = []
-        if self.latest_status.get('no_helmet'): missing_items.append('helmet')
-        if self.latest_status.get('no_gloves'): missing_items.append('gloves')
-        if self.latest_status.get('no_boots'):  missing_items.append('boots')
+        if status.get('no_helmet'): missing_items.append('helmet')
+        if status.get('no_gloves'): missing_items.append('gloves')
+        if status.get('no_boots'):  missing_items.append('boots')
 
-        ppe_status = self.latest_status.get('ppe_status', 'UNKNOWN')
+        ppe_status = status.get('ppe_status', 'UNKNOWN')
 
-        import os, numpy as np
         timestamp  = datetime.now()
         ts_str     = timestamp.strftime("%Y%m%d_%H%M%S")
         image_filename = f"rtsp_{self.camera_id}_{ts_str}.jpg"
         saved = False
 
-        if isinstance(self.latest_frame, bytes) and len(self.latest_frame) > 0:
+        frame_bytes = self.latest_frame
+        if isinstance(frame_bytes, bytes) and len(frame_bytes) > 0:
+            # Already a JPEG — write it as-is instead of decode + re-encode
             try:
-                os.makedirs(self.violations_dir, exist_ok=True)
-                nparr    = np.frombuffer(self.latest_frame, np.uint8)
-                frame_np = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                if frame_np is not None:
-                    saved = cv2.imwrite(
-                        os.path.join(self.violations_dir, image_filename), frame_np
-                    )
+                with open(os.path.join(self.violations_dir, image_filename), "wb") as f:
+                    f.write(frame_bytes)
+                saved = True
             except Exception as e:
                 print(f"❌ Error saving snapshot: {e}")
 
@@ -395,24 +591,27 @@ class RTSPStream:
             image_filename = None
 
         # Save to DB
+        fields = dict(
+            timestamp      = timestamp,
+            violation_type = "rtsp_manual_capture",
+            missing_items  = ", ".join(missing_items) if missing_items else "N/A",
+            image_path     = image_filename,
+            gate_action    = "RTSP_MANUAL",
+            operator_id    = supervisor_id,
+            notes          = (
+                notes or
+                f"[CCTV:{self.name}] Manual capture by supervisor. "
+                f"PPE status: {ppe_status}"
+                + (f" – missing: {', '.join(missing_items)}" if missing_items else "")
+            ),
+        )
         try:
             with self.flask_app.app_context():
-                record = Violation(
-                    timestamp      = timestamp,
-                    violation_type = "rtsp_manual_capture",
-                    missing_items  = ", ".join(missing_items) if missing_items else "N/A",
-                    image_path     = image_filename,
-                    gate_action    = "RTSP_MANUAL",
-                    operator_id    = supervisor_id,
-                    notes          = (
-                        notes or
-                        f"[CCTV:{self.name}] Manual capture by supervisor. "
-                        f"PPE status: {ppe_status}"
-                        + (f" – missing: {', '.join(missing_items)}" if missing_items else "")
-                    ),
-                )
-                db.session.add(record)
-                db.session.commit()
+                if self.violation_writer:
+                    self.violation_writer.submit(**fields)
+                else:
+                    db.session.add(Violation(**fields))
+                    db.session.commit()
                 print(f"📸 Manual CCTV capture logged: {self.name}")
 
                 # 🔌 WebSocket: notify dashboard of new RTSP violation
@@ -423,7 +622,7 @@ class RTSPStream:
                         "ppe_status":  ppe_status,
                         "missing":     missing_items,
                         "image":       image_filename,
-                        "time":        datetime.now().strftime('%H:%M:%S')
+                        "time":        hms_now()
                     })
 
                 return image_filename
@@ -442,40 +641,58 @@ class RTSPManager:
     per-camera helpers from routes.
     """
 
-    def __init__(self, model_path: str, flask_app, socketio=None):
+    MAX_BATCH = 16   # frames per forward pass — past this, latency grows faster than throughput
+
+    def __init__(self, model_path: str, flask_app, socketio=None, violation_writer=None):
         self.flask_app      = flask_app
         self.socketio       = socketio
+        self.violation_writer = violation_writer
         self.violations_dir = os.path.join(flask_app.root_path, "static", "violations")
+        os.makedirs(self.violations_dir, exist_ok=True)   # once, not per capture
         self._streams: dict[int, RTSPStream] = {}
+        self._ids: set[int] = set()   # every camera row, enabled or not — route 404 checks
 
-        # Share one YOLO model across all RTSP streams (memory-efficient)
+        # Share one YOLO model across all RTSP streams (memory-efficient).
+        # load_yolo() warms it up before the inference thread starts.
         print("🔄 Loading YOLO model for RTSP manager…")
-        self.model = YOLO(model_path)
-        print("✅ RTSP YOLO model loaded")
-
-        """✅ Warm-up: force model fuse ONCE before any threads start
-        This prevents the race condition where multiple threads
-        all try to fuse the model simultaneously on first inference"""
-        dummy = np.zeros((320, 320, 3), dtype=np.uint8)
-        self.model(dummy, verbose=False, imgsz=320)
+        self.model = load_yolo(model_path)
+        self._max_batch = min(self.MAX_BATCH, self.model.batch_limit)   # 1 for a static-shape export
         print("✅ RTSP YOLO model loaded and warmed up")
 
+        # One inference thread for every camera: pending frames from all
+        # streams go through the model as a single batch per pass
+        # Drawing + JPEG encoding run here, overlapping the next batch's inference
+        self._encoder     = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rtsp-jpeg")
+        # Auto-capture snapshot + DB writes — disk / SQLite never stall the batch
+        self._io          = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rtsp-io")
+        self._frame_ready = threading.Condition()
+        self._next_start  = 0      # round-robin start so a capped batch can't starve later streams
+        self._running     = True
+        self._infer_thread = threading.Thread(target=self._infer_loop, daemon=True)
+        self._infer_thread.start()
+
     # ── lifecycle ────────────────────────────────────────────
     def load_from_db(self):
         """Start streams for every enabled RTSPCamera row in the database."""
         with self.flask_app.app_context():
-            cameras = RTSPCamera.query.filter_by(enabled=True).all()
+            cameras = RTSPCamera.query.all()
             for cam in cameras:
-                self._start_stream(cam.id, cam.name, cam.url)
+                self._ids.add(cam.id)
+                if cam.enabled:
+                    self._start_stream(cam.id, cam.name, cam.url)
         print(f"📡 RTSPManager: {len(self._streams)} stream(s) started from DB")
 
     def cleanup(self):
+        self._running = False
         for stream in self._streams.values():
             stream.stop()
         self._streams.clear()
+        self._encoder.shutdown(wait=False)
+        self._io.shutdown(wait=True)   # let queued violation snapshots finish
 
     # ── stream control (called from routes) ─────────────────
     def add_stream(self, camera_id: int, name: str, url: str):
+        self._ids.add(camera_id)
         if camera_id in self._streams:
             return
         self._start_stream(camera_id, name, url)
@@ -486,22 +703,42 @@ class RTSPManager:
             })
 
     def remove_stream(self, camera_id: int):
-        """Stop and remove a stream."""
-        stream = self._streams.pop(camera_id, None)
-        if stream:
-            stream.stop()
+        """Stop and remove a stream — the camera row is being deleted."""
+        self._ids.discard(camera_id)
+        self._stop_stream(camera_id)
 
     def enable_stream(self, camera_id: int, name: str, url: str):
         self.add_stream(camera_id, name, url)
 
     def disable_stream(self, camera_id: int):
-        self.remove_stream(camera_id)
+        self._stop_stream(camera_id)   # row still exists — keep the ID known
+
+    def has_camera(self, camera_id: int) -> bool:
+        """
+        In-memory existence check for camera routes.
+        Falls back to the DB on a miss (row added by another worker process).
+        Must be called inside an app/request context.
+        """
+        if camera_id in self._ids:
+            return True
+        if db.session.get(RTSPCamera, camera_id) is None:
+            return False
+        self._ids.add(camera_id)
+        return True
 
     # ── data access (called from routes) ────────────────────
     def get_frame(self, camera_id: int) -> bytes | None:
         stream = self._streams.get(camera_id)
         return stream.get_snapshot() if stream else None
 
+    def wait_for_frame(self, camera_id: int, last_seq: int, timeout: float = 1.0):
+        """Per-camera RTSPStream.wait_for_frame; (None, last_seq) once the stream is gone."""
+        stream = self._streams.get(camera_id)
+        if not stream:
+            time.sleep(timeout)
+            return None, last_seq
+        return stream.wait_for_frame(last_seq, timeout)
+
     def get_status(self, camera_id: int) -> dict:
         stream = self._streams.get(camera_id)
         if not stream:
@@ -514,7 +751,8 @@ class RTSPManager:
         }
 
     def get_all_statuses(self) -> dict:
-        return {cid: self.get_status(cid) for cid in self._streams}
+        # list() snapshot — camera CRUD may mutate _streams from another thread
+        return {cid: self.get_status(cid) for cid in list(self._streams)}
 
     def active_count(self) -> int:
         return len(self._streams)
@@ -529,10 +767,65 @@ class RTSPManager:
             flask_app      = self.flask_app,
             violations_dir = self.violations_dir,
             socketio       = self.socketio,
+            violation_writer = self.violation_writer,
+            frame_ready    = self._frame_ready,
+            io_executor    = self._io,
         )
         stream.start()
         self._streams[camera_id] = stream
 
+    def _stop_stream(self, camera_id: int):
+        stream = self._streams.pop(camera_id, None)
+        if stream:
+            stream.stop()
+
+    def _take_pending(self):
+        """(stream, frame) for up to _max_batch streams with a frame awaiting inference."""
+        streams = list(self._streams.values())
+        if not streams:
+            return []
+        start   = self._next_start % len(streams)
+        batch   = []
+        for i in range(len(streams)):
+            stream = streams[(start + i) % len(streams)]
+            if stream._pending is not None:
+                batch.append((stream, stream._pending))
+                stream._pending = None
+                if len(batch) == self._max_batch:
+                    self._next_start = start + i + 1   # resume after the last one taken
+                    break
+        return batch
+
+    def _infer_loop(self):
+        pin_current_thread(INFER_CPUS)
+        while self._running:
+            with self._frame_ready:
+                self._frame_ready.wait_for(
+                    lambda: any(s._pending is not None for s in list(self._streams.values())),
+                    timeout=0.5)
+                batch = self._take_pending()
+            if not batch:
+                continue
+
+            frames = [frame for _, frame in batch]
+            try:
+                results = self.model(frames, **PREDICT_ARGS, conf=0.6, iou=0.6)
+            except Exception as e:
+                # e.g. an exported engine with a fixed batch of 1 — fall back to per-frame
+                print(f"⚠️ Batched RTSP inference failed ({e}) — running per frame")
+                try:
+                    results = [self.model(f, **PREDICT_ARGS, conf=0.6, iou=0.6)[0]
+                               for f in frames]
+                except Exception as e:
+                    print(f"❌ RTSP inference error: {e}")
+                    continue
+
+            for (stream, frame), result in zip(batch, results):
+                try:
+                    stream.finish_frame(frame, result, self._encoder)
+                except Exception as e:
+                    print(f"❌ RTSP result error [{stream.name}]: {e}")
+
     # Add to RTSPManager class
     def capture_violation(self, camera_id: int, supervisor_id: int, notes: str = ""):
         """Called from the route when supervisor clicks Capture."""
@@ -0,0 +1,86 @@
+# utils/status_cache.py
+"""
+Pre-serialized Status Cache
+------------------------------------
+• Polled read-only endpoints (/status, /events, /cameras/status/all) register
+  a builder; one daemon thread rebuilds every payload each INTERVAL seconds
+• Request handlers just return the cached bytes — no locks, no dict copies,
+  no JSON encoding on the request thread
+• invalidate() after a gate change bumps a generation counter. A payload
+  built from state read before that (even one still mid-rebuild in the
+  refresher) is stale: the next read rebuilds it inline, so a client never
+  sees the old relay state after a POST returns
+"""
+
+import threading
+
+
+class StatusCache:
+    """Holds encoded JSON bodies refreshed by a background thread."""
+
+    INTERVAL = 0.2   # seconds between background rebuilds (5 Hz)
+
+    def __init__(self, encode):
+        self._encode   = encode     # obj → bytes
+        self._builders = {}         # name → zero-arg callable returning a JSON-able obj
+        self._payloads = {}         # name → (generation it was built in, bytes)
+        self._gen      = 0          # bumped by invalidate()
+        self._lock     = threading.Lock()
+        self._wake     = threading.Event()
+        self._running  = False
+        self._thread   = None
+
+    # ── public API ──────────────────────────────────────────
+    def register(self, name, builder):
+        self._builders[name] = builder
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+
+    def invalidate(self):
+        """Mark every payload built so far stale and wake the refresher."""
+        with self._lock:
+            self._gen += 1
+        self._wake.set()
+
+    def payload(self, name):
+        """Encoded body for `name`, rebuilt inline if it predates the last invalidate()."""
+        gen   = self._gen
+        entry = self._payloads.get(name)
+        if entry is not None and entry[0] == gen:
+            return entry[1]
+        body = self._encode(self._builders[name]())   # a failing builder raises here
+        self._store(name, gen, body)
+        return body
+
+    def refresh(self):
+        # Read the generation BEFORE building: an invalidate() that lands while
+        # a builder runs leaves these payloads stale instead of marking them fresh
+        gen = self._gen
+        for name, build in list(self._builders.items()):
+            try:
+                self._store(name, gen, self._encode(build()))
+            except Exception as e:
+                print(f"❌ Status cache refresh error [{name}]: {e}")
+
+    def _store(self, name, gen, body):
+        """Keep `body` unless a payload from a newer generation is already cached."""
+        with self._lock:
+            entry = self._payloads.get(name)
+            if entry is None or gen >= entry[0]:
+                self._payloads[name] = (gen, body)
+
+    # ── internal loop ────────────────────────────────────────
+    def _loop(self):
+        while self._running:
+            self._wake.wait(self.INTERVAL)
+            self._wake.clear()
+            self.refresh()
@@ -0,0 +1,123 @@
+# utils/violation_writer.py
+"""
+Background Violation Writer
+------------------------------------
+• Route handlers and detector threads enqueue plain dicts and return at once
+• One daemon thread drains the queue and commits up to BATCH_SIZE rows per
+  transaction, so SQLite pays one fsync per batch instead of one per row
+• A failed commit is rolled back and retried with backoff — e.g. SQLite
+  "database is locked" while a maintenance purge holds the write lock
+• flush() on shutdown so queued records are never lost on a clean exit
+"""
+
+import queue
+import threading
+import time
+
+try:
+    from sqlalchemy.exc import OperationalError
+    from models import db, Violation
+    DATABASE_AVAILABLE = True
+except ImportError:
+    DATABASE_AVAILABLE = False
+    print("⚠️ Database not available for violation writer")
+
+
+class ViolationWriter:
+    """Queues Violation rows and bulk-inserts them from a background thread."""
+
+    BATCH_SIZE    = 50    # max rows per commit
+    BATCH_WAIT    = 0.2   # seconds to wait for more rows before committing
+    RETRY_LIMIT   = 5     # commit attempts per batch before its rows are dropped
+    RETRY_BACKOFF = 0.25  # seconds before the first retry, doubled after each one
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self._queue    = queue.Queue()
+        self._running  = False
+        self._thread   = None
+
+    # ── public API ──────────────────────────────────────────
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and commit anything still queued."""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self.flush()
+
+    def submit(self, **fields):
+        """Queue one Violation row — keyword args are Violation column values."""
+        self._queue.put(fields)
+
+    def flush(self):
+        """Synchronously commit every queued row (used on shutdown)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._commit(batch)
+
+    # ── internal loop ────────────────────────────────────────
+    def _loop(self):
+        while self._running:
+            try:
+                batch = [self._queue.get(timeout=self.BATCH_WAIT)]
+            except queue.Empty:
+                continue
+
+            # Give late arrivals a short window to join the same transaction
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=self.BATCH_WAIT))
+                except queue.Empty:
+                    break
+
+            self._commit(batch)
+
+    def _commit(self, batch):
+        """Insert `batch` in one transaction, retrying transient (lock / busy) errors."""
+        delay = self.RETRY_BACKOFF
+        for attempt in range(1, self.RETRY_LIMIT + 1):
+            try:
+                self._insert(batch)
+                return
+            except OperationalError as e:
+                error = e
+                if attempt == self.RETRY_LIMIT:
+                    break
+                print(f"⚠️ Violation writer DB busy ({e.orig}) — "
+                      f"retry {attempt}/{self.RETRY_LIMIT - 1} in {delay:.2f}s")
+                time.sleep(delay)
+                delay *= 2
+            except Exception as e:   # constraint / schema errors won't succeed on retry
+                error = e
+                break
+
+        print(f"❌ Violation writer DB error — {len(batch)} row(s) dropped: {error}")
+        for row in batch:
+            print(f"❌   dropped violation: {row}")
+
+    def _insert(self, batch):
+        with self.flask_app.app_context():
+            try:
+                # Core executemany — no ORM unit-of-work for fire-and-forget rows.
+                # Each executemany needs one key set, so group rows by their columns.
+                groups = {}
+                for row in batch:
+                    groups.setdefault(frozenset(row), []).append(row)
+                for rows in groups.values():
+                    db.session.execute(Violation.__table__.insert(), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()   # leave the scoped session usable for the retry
+                raise
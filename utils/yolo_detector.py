@@ -1,13 +1,25 @@
 # utils/yolo_detector.py
-from ultralytics import YOLO
+"""
+USB-camera YOLO processor.
+Invariant: `latest_frame` is always either None or a non-empty JPEG `bytes`
+object, so readers only need a truthiness check.
+"""
+from utils.model_loader import load_yolo, PREDICT_ARGS
+from utils.jpeg_codec import encode_jpeg
+from utils.clock import hms_now
+from utils.cpu_affinity import pin_current_thread, INFER_CPUS, CAPTURE_CPUS
+from utils.ppe_classes import PPEClasses, HELMET, GLOVES, BOOTS, NO_HELMET, NO_GLOVES, NO_BOOTS
 import cv2
+import os
 import threading
+import queue
 import time
 import platform
+from collections import deque
+from types import MappingProxyType
 from datetime import datetime
 
 try:
-    from flask_sqlalchemy import SQLAlchemy
     from models import db, Violation
     DATABASE_AVAILABLE = True
 except ImportError:
@@ -15,14 +27,36 @@ except ImportError:
     print("⚠️ Database not available - running in mock mode")
 
 class YOLOProcessor:
-    def __init__(self, model_path="models/best.pt", camera_index=0, flask_app=None, socketio=None):
+    def __init__(self, model_path="models/best.pt", camera_index=0, flask_app=None, socketio=None,
+                 batch_size=4, violation_writer=None, infer_every=1):
         # Load model
-        self.model = YOLO(model_path)
+        self.model = load_yolo(model_path)   # honours SPARC_MODEL_FORMAT accelerator export
+        self._classes = PPEClasses(self.model.names)   # per-class lookup tables, built once
         self.flask_app = flask_app
         self.socketio = socketio
+        self.violation_writer = violation_writer   # batches DB inserts off the gate loop
+        self.violations_dir = None
+        if flask_app is not None:
+            self.violations_dir = os.path.join(flask_app.root_path, "static", "violations")
+            os.makedirs(self.violations_dir, exist_ok=True)
+
+        # Frames per YOLO forward pass — batch of 4 roughly doubles throughput
+        # for ~130ms extra latency, which the gate logic tolerates fine.
+        # Capped at what the loaded backend accepts (1 for a static-shape export).
+        self.batch_size = max(1, min(int(batch_size), self.model.batch_limit))
+
+        # Run YOLO on every Nth captured frame; the frames in between are still
+        # streamed, drawn with the last stable boxes, so the feed keeps camera FPS
+        self.infer_every = max(1, int(infer_every))
+
+        # Read for in-between frames before the first batch has finished
+        self.fps            = 0.0
+        self.last_results   = None
+        self.stable_results = None
+        self.stable_count   = 0
 
         # Events + status tracking
-        self.events = []
+        self.events = deque(maxlen=10)   # only the latest 10 are ever shown — constant memory 24/7
         self.prev_status = "UNKNOWN"
 
         # Track individual item states to detect changes within the same overall status
@@ -43,34 +77,84 @@ class YOLOProcessor:
         self.start_time = time.time()
 
         # Open camera
-        # Updated code with explicit V4L2 backend:
-        if platform.system() == 'Windows':
-            self.cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
-        else:
-            # Linux/Raspberry Pi - use V4L2 backend explicitly
-            self.cap = cv2.VideoCapture(camera_index, cv2.CAP_V4L2)
-
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+        self.cap = self._open_camera(camera_index)
 
         self.latest_frame = None  # JPEG bytes
         self._frame_lock = threading.Lock()  # protects raw_frame access
-        self.latest_status = {
+        self._raw_cond   = threading.Condition(self._frame_lock)   # wakes inference on a new raw frame
+
+        # New-frame signalling for /video_feed — generators block on this
+        # instead of polling, so each client gets exactly one yield per frame
+        self._frame_cond = threading.Condition()
+        self._frame_seq  = 0
+
+        # Open /video_feed streams. With none, the render thread parks the newest
+        # frame in _idle_item instead of drawing + encoding it; snapshot_jpeg()
+        # renders that one on demand for gate / override snapshots
+        self.viewers       = 0
+        self._viewers_lock = threading.Lock()
+        self._idle_item    = None
+        self._idle_lock    = threading.Lock()
+
+        # Bumped after every inference result so the gate loop in app.py
+        # re-evaluates the relay the moment PPE status is refreshed
+        self._status_cond = threading.Condition()
+        self._status_seq  = 0
+
+        # Read-only snapshot, replaced (never mutated) after each inference.
+        # Rebinding is atomic, so readers just take the reference — no copy needed.
+        self.latest_status = MappingProxyType({
             "ppe_status": "UNKNOWN",
             "helmet": False,
             "gloves": False,
             "boots": False
-        }
+        })
         self.running = False
 
+    # Live-stream JPEG quality. Override / gate snapshots save these bytes as-is,
+    # so this also sets their size — 80 is ~2-3x smaller than OpenCV's default 95
+    JPEG_QUALITY = 80
+
+    # A partial batch is flushed this long after its first frame, so a slow or
+    # stalling camera never holds status updates past the latency budget above
+    BATCH_DEADLINE = 0.15
+
+    # GStreamer capture (opt-in with SPARC_USB_GSTREAMER=1, needs OpenCV built
+    # with GStreamer). Scaling/colour conversion run inside the pipeline and
+    # appsink keeps only the newest buffer, so no stale frames queue up.
+    GST_PIPELINE = (
+        "v4l2src device=/dev/video{index} ! "
+        "video/x-raw,width=320,height=240 ! videoconvert ! video/x-raw,format=BGR ! "
+        "appsink drop=true max-buffers=1 sync=false"
+    )
+
+    def _open_camera(self, camera_index):
+        if platform.system() != 'Windows' and os.environ.get("SPARC_USB_GSTREAMER") == "1":
+            cap = cv2.VideoCapture(self.GST_PIPELINE.format(index=camera_index), cv2.CAP_GSTREAMER)
+            if cap.isOpened():
+                print("✅ USB camera opened via GStreamer pipeline")
+                return cap
+            print("⚠️ GStreamer pipeline failed to open — falling back to V4L2")
+
+        # Updated code with explicit V4L2 backend:
+        if platform.system() == 'Windows':
+            cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
+        else:
+            # Linux/Raspberry Pi - use V4L2 backend explicitly
+            cap = cv2.VideoCapture(camera_index, cv2.CAP_V4L2)
+
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+        # Keep only one frame queued in the driver — stale frames pile up
+        # there whenever inference runs slower than the camera
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
     def capture_gate_violation(self, gate_action, reason=""):
         """
         Called only when gate state changes
         ONLY captures and saves image
         """
-        import os
-        import numpy as np
-
         elapsed = time.time() - self.start_time
         if elapsed < self.startup_grace_period:
             print("⏳ Still in grace period, skipping capture")
@@ -80,31 +164,81 @@ class YOLOProcessor:
         timestamp_str = timestamp.strftime("%Y%m%d_%H%M%S")
         image_filename = f"gate_{gate_action.lower()}_{timestamp_str}.jpg"
 
-        if not isinstance(self.latest_frame, bytes) or len(self.latest_frame) == 0:
+        frame_bytes = self.snapshot_jpeg()
+        if not frame_bytes:
             print("❌ No frame available")
             return None
 
-        nparr = np.frombuffer(self.latest_frame, np.uint8)
-        frame_np = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if frame_np is None or frame_np.size == 0:
-            print("❌ Frame decode failed")
-            return None
-
         if self.flask_app is None:
             print("⚠️ Flask app not available, cannot save image")
             return None
             
-        violations_dir = os.path.join(self.flask_app.root_path, "static", "violations")
-        os.makedirs(violations_dir, exist_ok=True)
-        full_path = os.path.join(violations_dir, image_filename)
+        full_path = os.path.join(self.violations_dir, image_filename)
 
-        if cv2.imwrite(full_path, frame_np):
+        # latest_frame is already JPEG-encoded — no decode/re-encode round trip
+        try:
+            with open(full_path, "wb") as f:
+                f.write(frame_bytes)
             print(f"✅ Image saved: {image_filename}")
             return image_filename
+        except OSError as e:
+            print(f"❌ Failed to save image: {e}")
+            return None
 
-        print("❌ Failed to save image")
-        return None
+    def _publish_frame(self, jpeg_bytes):
+        """Store the latest annotated JPEG and wake any waiting stream clients."""
+        assert type(jpeg_bytes) is bytes and jpeg_bytes, "latest_frame must be non-empty JPEG bytes"
+        with self._frame_cond:
+            self.latest_frame = jpeg_bytes
+            self._frame_seq += 1
+            self._frame_cond.notify_all()
+
+    def add_viewer(self):
+        with self._viewers_lock:
+            self.viewers += 1
+
+    def remove_viewer(self):
+        with self._viewers_lock:
+            self.viewers -= 1
+
+    def snapshot_jpeg(self):
+        """Newest annotated JPEG — renders the parked frame first if no viewer did."""
+        with self._idle_lock:
+            item, self._idle_item = self._idle_item, None
+        if item is not None:
+            self._render(*item)
+        return self.latest_frame
+
+    def _render(self, frame, stable_results, fps):
+        """Draw boxes + FPS on `frame` (the batch's own copy), encode and publish it."""
+        if stable_results is not None:
+            self._draw_boxes(frame, stable_results)
+        cv2.putText(frame, f"FPS: {fps}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        jpeg = encode_jpeg(frame, self.JPEG_QUALITY)
+        if jpeg:
+            self._publish_frame(jpeg)
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """
+        Block until a frame newer than `last_seq` is published.
+        Returns (frame, seq) — frame is None if the timeout expired first.
+        """
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self._frame_seq != last_seq, timeout=timeout)
+            if self._frame_seq == last_seq:
+                return None, last_seq
+            return self.latest_frame, self._frame_seq
+
+    def wait_for_status(self, last_seq, timeout=0.1):
+        """
+        Block until an inference result newer than `last_seq` has been processed
+        (or `timeout` elapses). Returns the current status sequence number.
+        """
+        with self._status_cond:
+            self._status_cond.wait_for(lambda: self._status_seq != last_seq, timeout=timeout)
+            return self._status_seq
 
     def update_gate_state(self, new_gate_state):
         """
@@ -117,8 +251,9 @@ class YOLOProcessor:
             
             # 🔧 FIXED: Only capture when gate CLOSES to deny entry
             if new_gate_state == "CLOSED":
-                ppe_status = self.latest_status.get('ppe_status', 'UNKNOWN')
-                has_violation = self.latest_status.get('has_violation', False)
+                status = self.latest_status   # one consistent snapshot for this decision
+                ppe_status = status.get('ppe_status', 'UNKNOWN')
+                has_violation = status.get('has_violation', False)
                 
                 # Only if it closed due to PPE violation (not just staying closed)
                 if ppe_status == "NOT_OK" and has_violation and self.prev_gate_state == "OPEN":
@@ -133,23 +268,27 @@ class YOLOProcessor:
                         
                         # Get missing items
                         missing_items = []
-                        if self.latest_status.get('no_helmet'): missing_items.append('helmet')
-                        if self.latest_status.get('no_gloves'): missing_items.append('gloves')
-                        if self.latest_status.get('no_boots'): missing_items.append('boots')
+                        if status.get('no_helmet'): missing_items.append('helmet')
+                        if status.get('no_gloves'): missing_items.append('gloves')
+                        if status.get('no_boots'): missing_items.append('boots')
                         
-                        if self.flask_app:
+                        fields = dict(
+                            timestamp=datetime.now(),
+                            violation_type='auto_denied',
+                            missing_items=', '.join(missing_items) if missing_items else 'N/A',
+                            image_path=image_filename,
+                            gate_action='AUTO_DENIED',
+                            operator_id=None,  # Automatic, no operator
+                            notes=f'Gate automatically closed - PPE violations detected: {", ".join(missing_items)}'
+                        )
+                        if self.violation_writer:
+                            # Called with the gate lock held — never wait on SQLite here
+                            self.violation_writer.submit(**fields)
+                            print("✅ AUTO_DENIED violation queued for database")
+                        elif self.flask_app:
                             try:
                                 with self.flask_app.app_context():
-                                    violation = Violation(
-                                        timestamp=datetime.now(),
-                                        violation_type='auto_denied',
-                                        missing_items=', '.join(missing_items) if missing_items else 'N/A',
-                                        image_path=image_filename,
-                                        gate_action='AUTO_DENIED',
-                                        operator_id=None,  # Automatic, no operator
-                                        notes=f'Gate automatically closed - PPE violations detected: {", ".join(missing_items)}'
-                                    )
-                                    db.session.add(violation)
+                                    db.session.add(Violation(**fields))
                                     db.session.commit()
                                     print(f"✅ AUTO_DENIED violation saved to database")
                             except Exception as e:
@@ -169,28 +308,28 @@ class YOLOProcessor:
             if self.socketio:
                 self.socketio.emit('gate_update', {
                     "relay": new_gate_state,
-                    "last_updated": datetime.now().strftime('%H:%M:%S')
+                    "last_updated": hms_now()
                 })
 
         self.current_gate_state = new_gate_state
 
-    def _process_results(self, results):
+    def _process_results(self, det):
         """
         🔧 UPDATED: Tracks both positive AND negative PPE detections
         Only marks as violation if negative classes are detected (no-helmet, no-gloves, no-boots)
+        `det` is a PPEClasses.to_host() array.
         """
-        names = self.model.names
-        classes = [names[int(b.cls)] for b in results.boxes]
+        mask = self._classes.ppe_mask(det)
         
         # Positive detections (PPE present)
-        helmet = "helmet" in classes
-        gloves = "gloves" in classes or "glove" in classes
-        boots = "boots" in classes
+        helmet = bool(mask & HELMET)
+        gloves = bool(mask & GLOVES)
+        boots = bool(mask & BOOTS)
         
         # 🔧 NEW: Negative detections (PPE violations - person present WITHOUT PPE)
-        no_helmet = "no-helmet" in classes
-        no_gloves = "no-gloves" in classes or "no-glove" in classes
-        no_boots = "no-boots" in classes
+        no_helmet = bool(mask & NO_HELMET)
+        no_gloves = bool(mask & NO_GLOVES)
+        no_boots = bool(mask & NO_BOOTS)
         
         # 🔧 CRITICAL: Only mark as NOT_OK if negative classes are detected
         # This means there's actually a person without proper PPE
@@ -214,7 +353,7 @@ class YOLOProcessor:
                 if no_gloves: missing.append("gloves")
                 if no_boots: missing.append("boots")
                 
-                ts = datetime.now().strftime("%H:%M:%S")
+                ts = hms_now()
                 msg = f"PPE VIOLATION detected: {', '.join(missing)}"
                 event = {"time": ts, "type": "danger", "message": msg}
                 self.events.append(event)
@@ -225,7 +364,7 @@ class YOLOProcessor:
                     self.socketio.emit('new_event', event)
 
         elif new_status == "OK" and self.prev_status == "NOT_OK":
-            ts = datetime.now().strftime("%H:%M:%S")
+            ts = hms_now()
             event = {"time": ts, "type": "success", "message": "All PPE detected"}
             self.events.append(event)
             print(f"✅ PPE Status: OK")
@@ -235,7 +374,7 @@ class YOLOProcessor:
                 self.socketio.emit('new_event', event)
 
         elif new_status == "UNKNOWN" and self.prev_status == "NOT_OK":
-            ts = datetime.now().strftime("%H:%M:%S")
+            ts = hms_now()
             event = {"time": ts, "type": "info", "message": "No person detected"}
             self.events.append(event)
             print(f"ℹ️ PPE Status: UNKNOWN (no person in frame)")
@@ -263,7 +402,7 @@ class YOLOProcessor:
                     "no_gloves":     no_gloves,
                     "no_boots":      no_boots,
                     "has_violation": has_violation,
-                    "last_updated":  datetime.now().strftime('%H:%M:%S')
+                    "last_updated":  hms_now()
                 })
             self.prev_items    = current_items
             self.last_emit_time = now
@@ -271,7 +410,7 @@ class YOLOProcessor:
         self.prev_status = new_status
         
         # 🔧 NEW: Store negative detections for violation tracking
-        self.latest_status.update({
+        self.latest_status = MappingProxyType({
             "ppe_status": new_status,
             "helmet": helmet,
             "gloves": gloves,
@@ -282,29 +421,13 @@ class YOLOProcessor:
             "has_violation": has_violation  # Easy check for violations
         })
 
-    def _draw_boxes(self, frame, results):
-        for b in results.boxes:
-            x1, y1, x2, y2 = map(int, b.xyxy[0])
-            cls_id = int(b.cls)
-            conf = float(b.conf)
-            
-            class_name = self.model.names[cls_id]
-            label = f"{class_name} {conf:.2f}"
-            
-            # Color coding
-            if class_name in ["helmet", "gloves", "glove", "boots"]:
-                color = (0, 255, 0)    # GREEN ✅
-                text_color = (0, 255, 0)
-            elif class_name.startswith("no-"):
-                color = (0, 0, 255)    # RED ❌
-                text_color = (0, 0, 255)
-            else:
-                color = (0, 255, 255)  # YELLOW
-                text_color = (0, 255, 255)
-            
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, label, (x1, y1 - 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 2)
+        with self._status_cond:
+            self._status_seq += 1
+            self._status_cond.notify_all()
+
+    def _draw_boxes(self, frame, det):
+        # Green = PPE worn, red = "no-*" classes, yellow = anything else
+        self._classes.draw_detections(frame, det)
 
     def loop(self):
         self.running = True
@@ -312,66 +435,137 @@ class YOLOProcessor:
         print(f"📸 Violations ONLY captured on: Manual Override + Gate State Changes")
 
         self.raw_frame = None
+        self._raw_seq = 0          # bumped by the capture thread on every new frame
         self.last_results = None
         self.stable_results = None
         self.stable_count = 0
         STABILITY_FRAMES = 3
 
         # Thread 1 — capture only, no YOLO
+        # Reads as fast as the camera delivers and overwrites a single slot,
+        # so inference always picks up the newest frame and older ones are dropped
         def capture_loop():
+            pin_current_thread(CAPTURE_CPUS)
             while self.running:
                 ok, frame = self.cap.read()
                 if ok:
-                    with self._frame_lock:
+                    with self._raw_cond:
                         self.raw_frame = frame
+                        self._raw_seq += 1
+                        self._raw_cond.notify()
                 else:
                     time.sleep(0.05)
 
         capture_thread = threading.Thread(target=capture_loop, daemon=True)
         capture_thread.start()
 
+        # Thread 3 — draw + JPEG encode + publish
+        # Runs while the next batch is inferring; a bounded queue that drops
+        # the oldest entry keeps the stream on the newest result
+        render_queue = queue.Queue(maxsize=2)
+
+        def render_loop():
+            while self.running:
+                try:
+                    item = render_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                with self._idle_lock:
+                    watched = self.viewers > 0
+                    # Nobody watching: park it, skip the draw + encode
+                    self._idle_item = None if watched else item
+                if watched:
+                    self._render(*item)
+
+        render_thread = threading.Thread(target=render_loop, daemon=True)
+        render_thread.start()
+
         # Thread 2 — inference loop
+        pin_current_thread(INFER_CPUS)
         prev_time = time.time()
+        last_seq = 0
+        frame_count = 0
+        batch = []
+        batch_due = 0.0   # monotonic time the current partial batch must be flushed by
+
+        def queue_render(item):
+            try:
+                render_queue.put_nowait(item)
+            except queue.Full:
+                try:
+                    render_queue.get_nowait()   # drop the oldest, keep latency bounded
+                except queue.Empty:
+                    pass
+                render_queue.put_nowait(item)
 
         while self.running:
-            with self._frame_lock:
+            # Block until the capture thread publishes a frame newer than last_seq,
+            # or until the pending batch's deadline
+            timeout = max(0.0, batch_due - time.monotonic()) if batch else 0.5
+            with self._raw_cond:
+                self._raw_cond.wait_for(lambda: self._raw_seq != last_seq, timeout=timeout)
                 raw = self.raw_frame
-            if raw is None:
-                time.sleep(0.01)
+                seq = self._raw_seq
+            if raw is not None and seq != last_seq:
+                # Any frames between last_seq and seq were overwritten — skipped on purpose
+                last_seq = seq
+                frame_count += 1
+                if frame_count % self.infer_every:
+                    # In-between frame: no inference, reuse the last stable boxes
+                    queue_render((raw.copy(), self.stable_results, self.fps))
+                else:
+                    if not batch:
+                        batch_due = time.monotonic() + self.BATCH_DEADLINE
+                    batch.append(raw.copy())
+
+            # Accumulate distinct frames, then run one forward pass for the batch
+            if not batch or (len(batch) < self.batch_size and time.monotonic() < batch_due):
                 continue
 
-            frame = raw.copy()
-            results = self.model(frame, verbose=False, imgsz=320, conf=0.5, iou=0.5)[0]
+            frames, batch = batch, []
+            try:
+                batch_results = self.model(frames, **PREDICT_ARGS, conf=0.5, iou=0.5)
+            except Exception as e:
+                # One bad batch must not kill the detector — the gate depends on its status
+                print(f"⚠️ Batched USB inference failed ({e}) — running per frame")
+                try:
+                    batch_results = [self.model(f, **PREDICT_ARGS, conf=0.5, iou=0.5)[0]
+                                     for f in frames]
+                except Exception as e:
+                    print(f"❌ USB inference error: {e}")
+                    continue
+
+            # Temporal stability filter — fed in capture order so the
+            # STABILITY_FRAMES count still means consecutive frames.
+            # Each frame's boxes are copied off the device once; status and
+            # drawing both reuse that (N, 6) array.
+            for results in batch_results:
+                det = self._classes.to_host(results.boxes)
+                if len(det) > 0:
+                    self.stable_count += 1
+                    self.last_results = det
+                    if self.stable_count >= STABILITY_FRAMES:
+                        self.stable_results = det
+                else:
+                    self.stable_count = 0
+                    self.stable_results = None
 
-            # Temporal stability filter
-            if len(results.boxes) > 0:
-                self.stable_count += 1
-                self.last_results = results
-                if self.stable_count >= STABILITY_FRAMES:
-                    self.stable_results = results
-            else:
-                self.stable_count = 0
-                self.stable_results = None
+            # Status + overlay come from the newest frame so the dashboard stays fresh
+            frame = frames[-1]   # `det` is still the newest frame's detections
 
-            # Process and draw stable results only
-            draw_frame = frame.copy()
+            # Process stable results only (drawing happens in the render thread)
             if self.stable_results is not None:
                 self._process_results(self.stable_results)
-                self._draw_boxes(draw_frame, self.stable_results)
             else:
                 # Still need to update status when no detections
-                self._process_results(results)
+                self._process_results(det)
 
-            # FPS overlay
+            # FPS (frames processed per second, not batches)
             curr_time = time.time()
-            self.fps = round(1 / (curr_time - prev_time), 1)
+            self.fps = round(len(frames) / (curr_time - prev_time), 1)
             prev_time = curr_time
-            cv2.putText(draw_frame, f"FPS: {self.fps}", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-            ret, jpeg = cv2.imencode(".jpg", draw_frame)
-            if ret:
-                self.latest_frame = jpeg.tobytes()
+            queue_render((frame, self.stable_results, self.fps))
 
         self.cap.release()
 